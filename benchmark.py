@@ -0,0 +1,209 @@
+"""
+Micro-benchmarks for the hot paths of the Minesweeper engine and solver.
+
+Each benchmark runs on boards dealt from fixed seeds, so results are comparable from run to
+run. Results can be saved as JSON and compared against a saved baseline, in which case any
+benchmark slower than the baseline by more than the threshold is reported as a regression
+and the exit status is 1.
+
+Usage:
+    python benchmark.py [-k PATTERN] [--save FILE] [--baseline FILE] [--threshold FRACTION]
+
+Created by Daniel Fay
+"""
+
+
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import tempfile
+from functools import lru_cache
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+
+from engine import Game, DIFFICULTIES, NeighborIndex, REVEALED, create_board
+from metrics import game_metrics
+from savefile import load_game, save_game
+from solver import Solver
+
+SEED = 1234
+
+# Boards every benchmark is run on, as (height, width, mines).
+BOARDS = dict(DIFFICULTIES, large=(500, 500, 5000))
+
+# Directory benchmarks write their files to, which run_all makes and removes again.
+scratch = None
+
+
+def new_game(height, width, mines):
+    """
+    Return a game dealt from the benchmark seed.
+    """
+    return Game(height, width, mines, seed=SEED)
+
+@lru_cache(maxsize=None)
+def opening(height, width, mines):
+    """
+    Return the tile of the benchmark board with no adjacent mines which opens the largest
+    region, or any safe tile if there is none.
+    """
+    game = new_game(height, width, mines)
+    zeros = np.flatnonzero(~game.is_mine & (game.counts == 0))
+    if not len(zeros):
+        return int(np.flatnonzero(~game.is_mine)[0])
+    sizes = {}
+    for i in zeros.tolist():
+        if not game.raw_state[i] & REVEALED:
+            sizes[i] = len(game.flood_fill(i))
+    return max(sizes, key=sizes.get)
+
+
+def bench_create_board(height, width, mines):
+    rng = np.random.default_rng(SEED)
+    return lambda: create_board(height, width, mines, rng=rng)
+
+def bench_neighbor_index(height, width, mines):
+    # Large boards build their neighbors lazily, so every tile is looked up as well.
+    def run():
+        cells = NeighborIndex((height, width)).cells
+        for i in range(height * width):
+            cells[i]
+    return run
+
+def bench_neighbors(height, width, mines):
+    game = new_game(height, width, mines)
+
+    def run():
+        for i in range(game.size):
+            game.neighbors(i)
+    return run
+
+def bench_flood_fill(height, width, mines):
+    game = new_game(height, width, mines)
+    start = opening(height, width, mines)
+    return lambda: game.flood_fill(start)
+
+def bench_check_win(height, width, mines):
+    game = new_game(height, width, mines)
+
+    def run():
+        for _ in range(1000):
+            game.check_win()
+    return run
+
+def bench_lose(height, width, mines):
+    game = new_game(height, width, mines)
+    return game.lose
+
+def bench_solve(height, width, mines):
+    game = new_game(height, width, mines)
+    game.reveal(opening(height, width, mines))
+    return Solver(game).solve
+
+def bench_load_game(height, width, mines):
+    game = new_game(height, width, mines)
+    game.reveal(opening(height, width, mines))
+    path = os.path.join(scratch, f"{height}x{width}x{mines}.mswp")
+    save_game(game, path)
+    return lambda: load_game(path)
+
+def bench_game_metrics(height, width, mines):
+    game = new_game(height, width, mines)
+    return lambda: game_metrics(game)
+
+
+# Each benchmark takes a board size and returns a function timed once per run.
+BENCHMARKS = {
+    "create_board": bench_create_board,
+    "neighbor_index": bench_neighbor_index,
+    "neighbors": bench_neighbors,
+    "flood_fill": bench_flood_fill,
+    "check_win": bench_check_win,
+    "lose": bench_lose,
+    "solve": bench_solve,
+    "load_game": bench_load_game,
+    "game_metrics": bench_game_metrics,
+}
+
+
+def run_benchmark(setup, board, min_runs=5, max_runs=200, min_time=0.2):
+    """
+    Time the function made by setup for the given board, making a fresh one for each run.
+
+    Runs are repeated until both min_runs and min_time are reached, or max_runs is. Returns
+    the median and fastest times in milliseconds and the number of runs.
+    """
+    times = []
+    while len(times) < min_runs or (sum(times) < min_time and len(times) < max_runs):
+        fn = setup(*board)
+        start = perf_counter()
+        fn()
+        times.append(perf_counter() - start)
+    return {"median_ms": 1000 * median(times), "min_ms": 1000 * min(times), "runs": len(times)}
+
+def run_all(pattern="*"):
+    """
+    Run every benchmark on every board whose name matches pattern, printing each result.
+    """
+    global scratch
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as scratch:
+        for bench, setup in BENCHMARKS.items():
+            for name, board in BOARDS.items():
+                key = f"{bench}/{name}"
+                if fnmatch.fnmatch(key, pattern):
+                    results[key] = run_benchmark(setup, board)
+                    print(f"{key:32} {results[key]['median_ms']:12.4f} ms")
+    scratch = None
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Print the change of each result against the baseline and return the names of the
+    benchmarks slower than it by more than threshold.
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result["median_ms"] / baseline[key]["median_ms"]
+        status = ""
+        if ratio > 1 + threshold:
+            status = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key:32} {baseline[key]['median_ms']:12.4f} -> {result['median_ms']:12.4f} ms "
+              f"({1 / ratio:.2f}x speedup){status}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Minesweeper engine and solver.")
+    parser.add_argument("-k", "--pattern", default="*", help="only run benchmarks matching this glob, eg 'solve/*'")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results against this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown over the baseline reported as a regression (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.pattern)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
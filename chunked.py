@@ -0,0 +1,339 @@
+"""
+Lazily generated, chunked boards for huge and unbounded games of Minesweeper.
+
+The board is split into square chunks. The mines of a chunk are dealt from the game's seed
+and the chunk's coordinates, so any chunk can be generated on its own, in any order, and
+always comes out the same. Nothing is generated until a move touches it: a chunk's mines are
+dealt when it or a neighboring chunk is first needed, and its adjacency counts are resolved,
+from its own mines and the borders of the eight chunks around it, when a tile in it is first
+revealed or marked. Starting a game is instant and memory grows only with the area explored.
+
+Created by Daniel Fay
+"""
+
+
+import numpy as np
+
+from engine import DIRECTIONS, FLAG, MINE, QUESTION, REVEALED, neighborhood_sums
+
+# Width and height of a chunk, in tiles.
+CHUNK_SIZE = 64
+
+# Most tiles a single reveal opens before stopping, see ChunkedGame.flood_fill.
+FILL_LIMIT = 1_000_000
+
+
+def _seed_key(n):
+    """
+    Map any integer to a distinct non-negative integer, for use in a seed sequence.
+    """
+    return 2 * n if n >= 0 else -2 * n - 1
+
+
+class Chunk:
+    """
+    One chunk of a board.
+
+    state packs the MINE, REVEALED, FLAG and QUESTION bits of each tile, row by row, as in
+    Game. counts is None until the chunk's adjacency counts have been resolved.
+    """
+    __slots__ = ("mines", "state", "counts")
+
+    def __init__(self, mines):
+        self.mines = mines
+        self.state = bytearray(mines.astype(np.uint8).tobytes())
+        self.counts = None
+
+
+class ChunkedGame:
+    """
+    A game of minesweeper on a lazily generated board.
+
+    Tiles are addressed by (row, col). A board with no height and width is unbounded in
+    every direction, including negative rows and columns, and can never be won. Each chunk
+    holds round(density * tiles) mines, so the mine count of a bounded board is known
+    without generating it.
+
+    As in Game, every method which changes the board returns the tiles whose state changed.
+    """
+    def __init__(self, density, seed, height=None, width=None, chunk_size=CHUNK_SIZE):
+        """
+        Start a new game. Nothing is generated until the first move.
+        """
+        self.density = density
+        self.seed = seed
+        self.height = height
+        self.width = width
+        self.chunk_size = chunk_size
+        self.bounded = height is not None
+
+        self._chunks = {}
+        self._pending = []
+
+        self.mines = self._count_mines() if self.bounded else None
+        self.flags = 0
+        self.correct_flags = 0
+        self.wrong_flags = 0
+        self.safe_revealed = 0
+        self.gameover = False
+        self.won = False
+        self.exploded = None
+
+    def _count_mines(self):
+        """
+        Return the number of mines on a bounded board.
+
+        Every chunk but those on the bottom and right edges is full, so only the four
+        distinct chunk shapes need counting.
+        """
+        total = 0
+        for rows, nrows in self._chunk_spans(self.height):
+            for cols, ncols in self._chunk_spans(self.width):
+                total += nrows * ncols * self._chunk_mines(rows * cols)
+        return total
+
+    def _chunk_spans(self, length):
+        """
+        Return the (tiles, number of chunks) pairs covering a bounded side of the given length.
+        """
+        full, rest = divmod(length, self.chunk_size)
+        return [(self.chunk_size, full)] + ([(rest, 1)] if rest else [])
+
+    def _chunk_mines(self, tiles):
+        return int(round(self.density * tiles))
+
+    def contains(self, row, col):
+        """
+        Return whether there is a tile at the given position.
+        """
+        return not self.bounded or (0 <= row < self.height and 0 <= col < self.width)
+
+    def generated(self):
+        """
+        Return the number of chunks generated so far.
+        """
+        return len(self._chunks)
+
+    def _in_range(self, cy, cx):
+        """
+        Return whether the chunk at the given chunk coordinates holds any tiles of the board.
+        """
+        size = self.chunk_size
+        return not self.bounded or (0 <= cy * size < self.height and 0 <= cx * size < self.width)
+
+    def _mines(self, cy, cx):
+        """
+        Return the chunk at the given chunk coordinates, dealing its mines if needed.
+        """
+        chunk = self._chunks.get((cy, cx))
+        if chunk is not None:
+            return chunk
+
+        size = self.chunk_size
+        mines = np.zeros((size, size), dtype=bool)
+        rows, cols = size, size
+        if self.bounded:
+            rows = min(size, self.height - cy * size)
+            cols = min(size, self.width - cx * size)
+
+        rng = np.random.default_rng([self.seed, _seed_key(cy), _seed_key(cx)])
+        placed = rng.choice(rows * cols, size=self._chunk_mines(rows * cols), replace=False)
+        mines[placed // cols, placed % cols] = True
+
+        chunk = self._chunks[(cy, cx)] = Chunk(mines)
+        return chunk
+
+    def _chunk(self, cy, cx):
+        """
+        Return the chunk at the given chunk coordinates with its adjacency counts resolved.
+        """
+        chunk = self._mines(cy, cx)
+        if chunk.counts is not None:
+            return chunk
+
+        # Pad the chunk's mines with the borders of the chunks around it.
+        size = self.chunk_size
+        padded = np.zeros((size + 2, size + 2), dtype=np.int8)
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                if not self._in_range(cy + i, cx + j):
+                    continue
+                mines = self._mines(cy + i, cx + j).mines
+                rows = slice(size + 1, size + 2) if i == 1 else slice(0, 1) if i == -1 else slice(1, size + 1)
+                cols = slice(size + 1, size + 2) if j == 1 else slice(0, 1) if j == -1 else slice(1, size + 1)
+                src_rows = slice(0, 1) if i == 1 else slice(size - 1, size) if i == -1 else slice(0, size)
+                src_cols = slice(0, 1) if j == 1 else slice(size - 1, size) if j == -1 else slice(0, size)
+                padded[rows, cols] = mines[src_rows, src_cols]
+
+        counts = neighborhood_sums(padded)
+        counts[chunk.mines] = 0
+        chunk.counts = bytearray(counts.astype(np.int8).tobytes())
+        return chunk
+
+    def _locate(self, row, col):
+        """
+        Return the resolved chunk holding the tile at (row, col) and the tile's index in it.
+        """
+        cy, y = divmod(row, self.chunk_size)
+        cx, x = divmod(col, self.chunk_size)
+        return self._chunk(cy, cx), y * self.chunk_size + x
+
+    def state(self, row, col):
+        """
+        Return the packed state bits of the tile at (row, col).
+        """
+        chunk, i = self._locate(row, col)
+        return chunk.state[i]
+
+    def mines_near(self, row, col):
+        """
+        Return the number of mines adjacent to the tile at (row, col).
+        """
+        chunk, i = self._locate(row, col)
+        return chunk.counts[i]
+
+    def remaining(self):
+        """
+        Return the number of mines not yet marked by a flag, or None on an unbounded board.
+        """
+        return self.mines - self.flags if self.bounded else None
+
+    def neighbors(self, row, col):
+        """
+        Return a list of the positions neighboring (row, col).
+        """
+        return [(row + i, col + j) for i, j in DIRECTIONS if self.contains(row + i, col + j)]
+
+    def reveal(self, row, col):
+        """
+        Reveal the tile at (row, col), losing the game if it is a mine.
+
+        Flagged tiles are protected and cannot be revealed. Returns the revealed positions.
+        On a loss only the mine is revealed, as the rest of the board may not exist yet.
+        """
+        if self.gameover or not self.contains(row, col):
+            return []
+        chunk, i = self._locate(row, col)
+        if chunk.state[i] & (REVEALED | FLAG):
+            return []
+
+        if chunk.state[i] & MINE:
+            self.exploded = (row, col)
+            self.gameover = True
+            chunk.state[i] |= REVEALED
+            return [(row, col)]
+
+        flipped = self.flood_fill(row, col)
+        self.check_win()
+        return flipped
+
+    def flood_fill(self, row, col, limit=FILL_LIMIT):
+        """
+        Reveal the safe tile at (row, col) and the empty region around it, as Game.flood_fill.
+
+        At low densities an empty region of an unbounded board may never end, so the fill
+        stops after limit tiles. The tiles it had still to expand are kept, and resume_fill
+        carries on from them.
+        """
+        chunk, i = self._locate(row, col)
+        flipped = [(row, col)]
+        self._reveal_tile(chunk, i)
+        if not chunk.counts[i]:
+            self._pending.append((row, col))
+        return flipped + self.resume_fill(limit - 1)
+
+    def resume_fill(self, limit=FILL_LIMIT):
+        """
+        Carry on revealing any empty regions left unfinished by flood_fill, opening at most
+        limit tiles. Returns the revealed positions.
+        """
+        stack = self._pending
+        flipped = []
+        while stack and len(flipped) < limit:
+            r, c = stack.pop()
+            for i, j in DIRECTIONS:
+                nr, nc = r + i, c + j
+                if not self.contains(nr, nc):
+                    continue
+                chunk, k = self._locate(nr, nc)
+                if chunk.state[k] & REVEALED:
+                    continue
+                self._reveal_tile(chunk, k)
+                flipped.append((nr, nc))
+                if not chunk.counts[k]:
+                    stack.append((nr, nc))
+        return flipped
+
+    def _reveal_tile(self, chunk, i):
+        """
+        Reveal a safe tile, removing any mark the player placed on it.
+        """
+        state = chunk.state[i]
+        if state & FLAG:
+            self.flags -= 1
+            self.wrong_flags -= 1
+        chunk.state[i] = (state | REVEALED) & ~(FLAG | QUESTION)
+        self.safe_revealed += 1
+        return
+
+    def set_flag(self, row, col, flag):
+        """
+        Add/remove a flag on the tile at (row, col).
+        """
+        if self.gameover or not self.contains(row, col):
+            return []
+        chunk, i = self._locate(row, col)
+        state = chunk.state[i]
+        if state & REVEALED:
+            return []
+
+        if bool(state & FLAG) != flag:
+            step = 1 if flag else -1
+            self.flags += step
+            if state & MINE:
+                self.correct_flags += step
+            else:
+                self.wrong_flags += step
+        chunk.state[i] = (state | FLAG if flag else state & ~FLAG) & ~QUESTION
+
+        self.check_win()
+        return [(row, col)]
+
+    def set_question(self, row, col, quest):
+        """
+        Add/remove a question mark on the tile at (row, col).
+        """
+        if self.gameover or not self.contains(row, col):
+            return []
+        changed = self.set_flag(row, col, False)
+        if changed:
+            chunk, i = self._locate(row, col)
+            if quest:
+                chunk.state[i] |= QUESTION
+        return changed
+
+    def cycle_mark(self, row, col):
+        """
+        Toggle the mark on the tile at (row, col) in the following order: tile-flag-question-tile...
+        """
+        state = self.state(row, col)
+        if state & FLAG:
+            return self.set_question(row, col, True)
+        elif state & QUESTION:
+            return self.set_question(row, col, False)
+        return self.set_flag(row, col, True)
+
+    def check_win(self):
+        """
+        Check if the player won the game, which is only possible on a bounded board.
+
+        Does not return anything.
+        """
+        if not self.bounded:
+            return
+        # Without mines there is nothing to flag, so only revealing every tile wins.
+        if self.safe_revealed == self.height * self.width - self.mines or \
+                (self.mines and self.correct_flags == self.mines and not self.wrong_flags):
+            self.gameover = True
+            self.won = True
+        return
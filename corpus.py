@@ -0,0 +1,132 @@
+"""
+Bulk generation of Minesweeper board corpora, written to memory-mapped .npy files.
+
+A corpus is a directory holding one .npy file per array, each with the boards along its
+first axis, and a corpus.json file describing them:
+
+    mines.npy       (N, H, W) bool, the mine mask of each board
+    counts.npy      (N, H, W) int8, the number of mines next to each non-mine tile
+    revealed.npy    (N, H, W) bool, the tiles revealed by the solver        (with --label)
+    flagged.npy     (N, H, W) bool, the tiles the solver proved to be mines (with --label)
+    won.npy         (N,) bool, whether the solver won the board             (with --label)
+    bbbv.npy, openings.npy, islands.npy, guesses.npy
+                    (N,) int32, the difficulty metrics of each board        (with --metrics)
+
+Boards are dealt in batches with batch.deal, each safe around the start tile, and every
+batch is written straight into the memory-mapped files and dropped, so memory use depends
+only on the batch size and never on the size of the corpus. The labels are the game state
+batch.solve reaches after clicking the start tile and making only certain moves. The files
+are plain .npy, so they can be read back with np.load(..., mmap_mode="r") or open_corpus.
+The metrics are those of metrics.board_metrics, with the guesses counted from the start tile
+by playing every board with the Solver, so a corpus with --metrics takes far longer.
+
+Usage:
+    python corpus.py PATH [-n BOARDS] [--batch K] [--seed SEED] [--label] [--metrics] [BOARD]
+
+Created by Daniel Fay
+"""
+
+
+import argparse
+import json
+import os
+from time import perf_counter
+
+import numpy as np
+
+from batch import BATCH_SIZE, board_counts, deal, solve
+from metrics import board_metrics
+
+# Name of the file describing a corpus.
+META_NAME = "corpus.json"
+
+# Arrays of a corpus, of the solver labels and of the difficulty metrics, as (name, dtype,
+# per board shape or None for the board's own shape).
+ARRAYS = [("mines", np.bool_, None), ("counts", np.int8, None)]
+LABELS = [("revealed", np.bool_, None), ("flagged", np.bool_, None), ("won", np.bool_, ())]
+METRICS = [(name, np.int32, ()) for name in ("bbbv", "openings", "islands", "guesses")]
+
+
+def generate(path, count, height, width, mines, seed=0, batch=BATCH_SIZE, label=False, metrics=False,
+             start=None):
+    """
+    Deal count boards of the given size into a new corpus in the directory path, batch
+    boards at a time.
+
+    Every board is safe around start, a flat tile index, which defaults to the middle of
+    the board. If label is true the solver plays each board from start and its game state
+    is saved with it, and if metrics is true so are its difficulty metrics. Returns the
+    corpus description written to corpus.json.
+    """
+    if start is None:
+        start = (height // 2) * width + width // 2
+    os.makedirs(path, exist_ok=True)
+    arrays = ARRAYS + (LABELS if label else []) + (METRICS if metrics else [])
+    files = {name: np.lib.format.open_memmap(os.path.join(path, name + ".npy"), mode="w+", dtype=dtype,
+                                             shape=(count,) + ((height, width) if shape is None else shape))
+             for name, dtype, shape in arrays}
+
+    rng = np.random.default_rng(seed)
+    for done in range(0, count, batch):
+        end = min(done + batch, count)
+        is_mine = deal(end - done, height, width, mines, rng, safe=start)
+        counts = board_counts(is_mine)
+        files["mines"][done:end] = is_mine
+        files["counts"][done:end] = counts
+        if label:
+            revealed, flagged, won, guesses, rounds = solve(is_mine, start)
+            files["revealed"][done:end] = revealed
+            files["flagged"][done:end] = flagged
+            files["won"][done:end] = won
+        if metrics:
+            for name, values in board_metrics(is_mine, counts, start).items():
+                files[name][done:end] = values
+        for f in files.values():
+            f.flush()
+
+    meta = {"count": count, "height": height, "width": width, "mines": mines, "seed": seed,
+            "start": start, "arrays": [name for name, dtype, shape in arrays]}
+    with open(os.path.join(path, META_NAME), "w") as f:
+        json.dump(meta, f, indent=2)
+    del files
+    return meta
+
+def open_corpus(path):
+    """
+    Open the corpus in the directory path read only.
+
+    Returns its description from corpus.json and a dict of its arrays, memory-mapped so
+    that only the boards used are read from disk, by name.
+    """
+    with open(os.path.join(path, META_NAME)) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in meta["arrays"]}
+    return meta, arrays
+
+def main(argv=None):
+    from simulate import parse_board
+
+    parser = argparse.ArgumentParser(description="Generate a corpus of Minesweeper boards as .npy files.")
+    parser.add_argument("path", help="directory to write the corpus to")
+    parser.add_argument("board", nargs="?", type=parse_board, default="expert", metavar="BOARD",
+                        help="difficulty name or HEIGHTxWIDTHxMINES size (default: expert)")
+    parser.add_argument("-n", "--count", type=int, default=1_000_000, help="boards to generate")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="boards generated together")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the boards")
+    parser.add_argument("--label", action="store_true", help="also save the game state the solver reaches")
+    parser.add_argument("--metrics", action="store_true", help="also save the difficulty metrics of each board")
+    args = parser.parse_intermixed_args(argv)
+
+    name, height, width, mines = args.board
+    begin = perf_counter()
+    meta = generate(args.path, args.count, height, width, mines, args.seed, args.batch, args.label,
+                    args.metrics)
+    elapsed = perf_counter() - begin
+    size = sum(os.path.getsize(os.path.join(args.path, array + ".npy")) for array in meta["arrays"])
+    print(f"{name}: {args.count} boards written to {args.path} in {elapsed:.1f}s "
+          f"({args.count / elapsed:.0f} boards/s, {size / 2 ** 20:.1f} MiB)")
+    return
+
+
+if __name__ == "__main__":
+    main()
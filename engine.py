@@ -0,0 +1,529 @@
+"""
+Headless game engine for Minesweeper.
+
+The engine holds the board and all of the reveal, flag, win and lose logic. It has no
+dependency on tkinter or PIL and keeps no module level game state, so any number of games
+can be played side by side in one process.
+
+Created by Daniel Fay
+"""
+
+
+import os
+
+import numpy as np
+
+# Board dimensions for each difficulty, as (height, width, mines).
+DIFFICULTIES = {
+    "beginner": (8, 8, 10),
+    "intermediate": (16, 16, 40),
+    "expert": (16, 30, 99),
+}
+
+
+def new_seed():
+    """
+    Return a fresh random 64 bit seed for dealing a board.
+    """
+    return int.from_bytes(os.urandom(8), "little")
+
+def create_board(height, width, mines, safe=None, rng=None):
+    """
+    Create a board with the given height, width, and number of mines.
+
+    The mines are dealt by rng, a numpy Generator, or from numpy's global random state if
+    none is given. If safe is the flat index of a tile, neither it nor, where there is room,
+    any of its neighbors will be a mine, so that a first click on it opens the board. Raises
+    ValueError if the mines do not fit around it.
+
+    Returns a boolean array marking the mines and an array holding, for each non-mine tile,
+    the number of mines nearby.
+    """
+    if rng is None:
+        rng = np.random
+    if safe is None:
+        board = np.arange(height * width)
+        rng.shuffle(board)
+        board = board.reshape((height, width))
+        is_mine = board >= height * width - mines
+    else:
+        if height * width - 1 < mines:
+            raise ValueError(f"{mines} mines do not fit on a {height}x{width} board with a safe tile")
+        excluded = (safe,) + neighbor_index((height, width)).cells[safe]
+        if height * width - len(excluded) < mines:
+            excluded = (safe,)
+        allowed = np.setdiff1d(np.arange(height * width), excluded)
+        rng.shuffle(allowed)
+        is_mine = np.zeros(height * width, dtype=bool)
+        is_mine[allowed[:mines]] = True
+        is_mine = is_mine.reshape((height, width))
+
+    return is_mine, mine_counts(is_mine)
+
+def mine_counts(is_mine):
+    """
+    Return the number of mines adjacent to each non-mine tile of the given mine mask.
+
+    The mask is padded with a border of empty tiles and summed over each 3x3 neighborhood,
+    so the whole board is handled in a few array operations. Mine tiles are set to 0.
+    """
+    height, width = is_mine.shape
+    padded = np.zeros((height + 2, width + 2), dtype=np.int8)
+    padded[1:-1, 1:-1] = is_mine
+
+    counts = neighborhood_sums(padded)
+    counts[is_mine] = 0
+    return counts
+
+def neighborhood_sums(padded):
+    """
+    Return the sum over the 3x3 neighborhood of every tile inside the one tile border of
+    padded.
+
+    The sums are computed as a vertical then a horizontal sum of shifted views.
+    """
+    cols = padded[:-2] + padded[1:-1] + padded[2:]
+    return cols[:, :-2] + cols[:, 1:-1] + cols[:, 2:]
+
+# Bits of the packed state of each tile.
+MINE = 1
+REVEALED = 2
+FLAG = 4
+QUESTION = 8
+
+# Offsets to the eight tiles surrounding a tile, as (row, col).
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+_neighbor_indexes = {}
+
+# Boards with more tiles than this work out the neighbors of a tile from its row and column
+# when they are looked up, as keeping a tuple of them for every tile costs about 400 bytes a
+# tile.
+TUPLE_LIMIT = 1 << 16
+
+
+class NeighborIndex:
+    """
+    Precomputed neighbors of every tile for one board shape.
+
+    Tiles are addressed by their flat index, row * width + col. The neighbors of tile i are
+    indices[indptr[i]:indptr[i + 1]] in CSR form, for use by array code, and cells[i] as a
+    tuple, so Python loops can look them up without allocating anything. Each form is built
+    on first use, and on boards of more than TUPLE_LIMIT tiles cells is a NeighborCells.
+    """
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self._csr = None
+        self._cells = None
+
+    def _build_csr(self):
+        height, width = self.shape
+        rows, cols = np.divmod(np.arange(height * width), width)
+
+        targets = np.empty((height * width, len(DIRECTIONS)), dtype=np.int32)
+        valid = np.empty(targets.shape, dtype=bool)
+        for k, (i, j) in enumerate(DIRECTIONS):
+            valid[:, k] = (0 <= rows + i) & (rows + i < height) & (0 <= cols + j) & (cols + j < width)
+            targets[:, k] = (rows + i) * width + cols + j
+
+        indptr = np.zeros(height * width + 1, dtype=np.int32)
+        np.cumsum(valid.sum(axis=1), out=indptr[1:])
+        self._csr = (targets[valid], indptr)
+        return self._csr
+
+    @property
+    def indices(self):
+        return (self._csr or self._build_csr())[0]
+
+    @property
+    def indptr(self):
+        return (self._csr or self._build_csr())[1]
+
+    @property
+    def cells(self):
+        if self._cells is None:
+            height, width = self.shape
+            if height * width > TUPLE_LIMIT:
+                self._cells = NeighborCells(height, width)
+            else:
+                indices, indptr = self.indices.tolist(), self.indptr.tolist()
+                self._cells = tuple(tuple(indices[indptr[i]:indptr[i + 1]]) for i in range(height * width))
+        return self._cells
+
+
+class NeighborCells:
+    """
+    The neighbors of every tile of a large board, looked up as NeighborIndex.cells but worked
+    out from the row and column of the tile on each lookup, so they take no memory.
+    """
+    __slots__ = ("height", "width", "_last")
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self._last = (height - 1) * width
+
+    def __len__(self):
+        return self.height * self.width
+
+    def __getitem__(self, i):
+        width = self.width
+        col = i % width
+        if width <= i < self._last and 0 < col < width - 1:
+            up, down = i - width, i + width
+            return (up - 1, up, up + 1, i - 1, i + 1, down - 1, down, down + 1)
+
+        # Tiles on the edge of the board.
+        cols = [j for j in (-1, 0, 1) if 0 <= col + j < width]
+        nbrs = []
+        if i >= width:
+            nbrs.extend(i - width + j for j in cols)
+        nbrs.extend(i + j for j in cols if j)
+        if i < self._last:
+            nbrs.extend(i + width + j for j in cols)
+        return tuple(nbrs)
+
+
+def neighbor_index(shape):
+    """
+    Return the NeighborIndex for boards of the given shape.
+
+    The index is built on first use and shared by every game of that shape.
+    """
+    shape = tuple(shape)
+    if shape not in _neighbor_indexes:
+        _neighbor_indexes[shape] = NeighborIndex(shape)
+    return _neighbor_indexes[shape]
+
+def neighbors(pos, shape):
+    """
+    Return a tuple of the flat indices neighboring the tile at flat index pos.
+    """
+    return neighbor_index(shape).cells[pos]
+
+
+class Cell:
+    """
+    A lightweight view of a single tile of a game, created on demand.
+    """
+    __slots__ = ("game", "index")
+
+    def __init__(self, game, index):
+        self.game = game
+        self.index = index
+
+    def _has(self, bit):
+        return bool(self.game.raw_state[self.index] & bit)
+
+    @property
+    def position(self):
+        return self.game.position(self.index)
+
+    @property
+    def is_mine(self):
+        return self._has(MINE)
+
+    @property
+    def revealed(self):
+        return self._has(REVEALED)
+
+    @property
+    def flagged(self):
+        return self._has(FLAG)
+
+    @property
+    def questioned(self):
+        return self._has(QUESTION)
+
+    @property
+    def mines_near(self):
+        return self.game.raw_counts[self.index]
+
+
+class Game:
+    """
+    A single game of minesweeper.
+
+    Tiles are addressed by their flat index, row * width + col. The board is held as two flat
+    arrays of one byte per tile: state packs the MINE, REVEALED, FLAG and QUESTION bits of
+    each tile, and counts holds the number of mines next to each safe tile. raw_state and
+    raw_counts are bytearrays sharing memory with these, for fast access to single tiles from
+    Python loops, and is_mine, revealed, flagged and questioned unpack whole boolean masks.
+
+    Every method which changes the board returns the indices of the tiles whose state
+    changed, so a view only needs to redraw those tiles. Once the game is over the whole board
+    should be redrawn.
+
+    The game is won once every safe tile is revealed, or once every mine is flagged with no
+    flags on safe tiles. Running counts of revealed safe tiles and of correct and wrong flags
+    are kept as the board changes, so checking for a win never scans the board.
+    """
+    def __init__(self, height, width, mines, difficulty=None, board=None, seed=None):
+        """
+        Start a new game on a board with the given dimensions.
+
+        The mines are dealt from seed, or from a fresh random seed, unless board, a boolean
+        mask of the mines of the given shape, is given.
+        """
+        self.height = height
+        self.width = width
+        self.mines = mines
+        self.shape = (height, width)
+        self.size = height * width
+        self.difficulty = difficulty
+        self.nbrs = neighbor_index(self.shape).cells
+
+        self.new_game(board, seed)
+
+    def new_game(self, board=None, seed=None):
+        """
+        Discard the current board and deal a new one with the same dimensions, or set up the
+        given mask of mines.
+
+        A dealt board is generated from seed, or from a fresh random seed, which is kept as
+        the game's seed so the same board can be dealt again. seed is None for a given board.
+        """
+        if board is None:
+            if seed is None:
+                seed = new_seed()
+            rng = np.random.default_rng(seed)
+            is_mine, counts = create_board(self.height, self.width, self.mines, rng=rng)
+        else:
+            seed = None
+            is_mine = np.asarray(board, dtype=bool).reshape(self.shape)
+            if np.count_nonzero(is_mine) != self.mines:
+                raise ValueError(f"board has {np.count_nonzero(is_mine)} mines, expected {self.mines}")
+            counts = mine_counts(is_mine)
+        self.seed = seed
+        self.raw_state = bytearray(is_mine.astype(np.uint8).tobytes())
+        self.raw_counts = bytearray(counts.astype(np.int8).tobytes())
+        self.state = np.frombuffer(self.raw_state, dtype=np.uint8)
+        self.counts = np.frombuffer(self.raw_counts, dtype=np.int8)
+
+        self.flags = 0
+        self.correct_flags = 0
+        self.wrong_flags = 0
+        self.safe_revealed = 0
+        self.gameover = False
+        self.won = False
+        self.exploded = None
+        return
+
+    def restore(self, state, gameover=False, won=False, exploded=None):
+        """
+        Set the state bits of every tile from state, a flat array of packed states saved from
+        a game on the same board, and recompute the running counts from it.
+        """
+        state = np.asarray(state, dtype=np.uint8).ravel()
+        if not np.array_equal(state & MINE, self.state & MINE):
+            raise ValueError("state does not match the mines of the board")
+        self.state[:] = state
+
+        is_mine = self.is_mine
+        flagged = self.flagged
+        self.flags = int(np.count_nonzero(flagged))
+        self.correct_flags = int(np.count_nonzero(flagged & is_mine))
+        self.wrong_flags = self.flags - self.correct_flags
+        self.safe_revealed = int(np.count_nonzero(self.revealed & ~is_mine))
+        self.gameover = gameover
+        self.won = won
+        self.exploded = exploded
+        return
+
+    def copy(self):
+        """
+        Return an independent copy of the game, such as a snapshot for another thread to
+        play on.
+        """
+        new = Game.__new__(Game)
+        new.__dict__.update(self.__dict__)
+        new.raw_state = bytearray(self.raw_state)
+        new.raw_counts = bytearray(self.raw_counts)
+        new.state = np.frombuffer(new.raw_state, dtype=np.uint8)
+        new.counts = np.frombuffer(new.raw_counts, dtype=np.int8)
+        return new
+
+    @property
+    def is_mine(self):
+        return (self.state & MINE) != 0
+
+    @property
+    def revealed(self):
+        return (self.state & REVEALED) != 0
+
+    @property
+    def flagged(self):
+        return (self.state & FLAG) != 0
+
+    @property
+    def questioned(self):
+        return (self.state & QUESTION) != 0
+
+    def cell(self, i):
+        """
+        Return a view of tile i.
+        """
+        return Cell(self, i)
+
+    def index(self, row, col):
+        """
+        Return the flat index of the tile at the given row and column.
+        """
+        return row * self.width + col
+
+    def position(self, i):
+        """
+        Return the (row, col) position of the tile at flat index i.
+        """
+        return divmod(i, self.width)
+
+    def remaining(self):
+        """
+        Return the number of mines not yet marked by a flag.
+
+        Note, this counts remaining mines according to what the player marks, not
+        according to how many mines have/have not been correctly marked.
+        """
+        return self.mines - self.flags
+
+    def neighbors(self, i):
+        """
+        Return a tuple of the tiles neighboring tile i.
+        """
+        return self.nbrs[i]
+
+    def reveal(self, i):
+        """
+        Reveal tile i, losing the game if it is a mine.
+
+        Flagged tiles are protected and cannot be revealed. Returns the revealed tiles as an
+        index array.
+        """
+        if self.gameover or self.raw_state[i] & (REVEALED | FLAG):
+            return np.empty(0, dtype=np.intp)
+
+        if self.raw_state[i] & MINE:
+            self.exploded = i
+            self.lose()
+            return np.array([i], dtype=np.intp)
+
+        flipped = self.flood_fill(i)
+        self.check_win()
+        return flipped
+
+    def flood_fill(self, i):
+        """
+        Reveal the safe tile i and, if it has no adjacent mines, the whole empty region around it.
+
+        The region is filled from an explicit stack rather than by recursion, so a region of any
+        size opens in one pass without growing the call stack. Returns the newly revealed tiles
+        as an index array.
+        """
+        state, counts, nbrs = self.raw_state, self.raw_counts, self.nbrs
+
+        state[i] |= REVEALED
+        flipped = [i]
+        stack = [] if counts[i] else [i]
+        while stack:
+            for nbr in nbrs[stack.pop()]:
+                if not state[nbr] & REVEALED:
+                    state[nbr] |= REVEALED
+                    flipped.append(nbr)
+                    if not counts[nbr]:
+                        stack.append(nbr)
+
+        flipped = np.array(flipped, dtype=np.intp)
+
+        # Revealed tiles lose any mark the player placed on them, and are never mines so any
+        # flag removed was a wrong one.
+        self.safe_revealed += len(flipped)
+        removed = int(np.count_nonzero(self.state[flipped] & FLAG))
+        self.flags -= removed
+        self.wrong_flags -= removed
+        self.state[flipped] &= ~np.uint8(FLAG | QUESTION)
+        return flipped
+
+    def set_flag(self, i, flag):
+        """
+        Add/remove a flag on tile i.
+        """
+        if self.gameover or self.raw_state[i] & REVEALED:
+            return []
+
+        self._mark_flag(i, flag)
+        self.raw_state[i] &= ~QUESTION
+
+        self.check_win()
+        return [i]
+
+    def set_question(self, i, quest):
+        """
+        Add/remove a question mark on tile i.
+        """
+        if self.gameover or self.raw_state[i] & REVEALED:
+            return []
+
+        self._mark_flag(i, False)
+        if quest:
+            self.raw_state[i] |= QUESTION
+        else:
+            self.raw_state[i] &= ~QUESTION
+
+        self.check_win()
+        return [i]
+
+    def _mark_flag(self, i, flag):
+        """
+        Add/remove the flag on tile i, keeping the flag counts up to date.
+        """
+        state = self.raw_state[i]
+        if bool(state & FLAG) == flag:
+            return
+        step = 1 if flag else -1
+        self.flags += step
+        if state & MINE:
+            self.correct_flags += step
+        else:
+            self.wrong_flags += step
+        self.raw_state[i] = state ^ FLAG
+        return
+
+    def cycle_mark(self, i):
+        """
+        Toggle the mark on tile i in the following order: tile-flag-question-tile...
+        """
+        state = self.raw_state[i]
+        if state & FLAG:
+            return self.set_question(i, True)
+        elif state & QUESTION:
+            return self.set_question(i, False)
+        return self.set_flag(i, True)
+
+    def check_win(self):
+        """
+        Check if the player won the game.
+
+        Does not return anything.
+        """
+        if self.safe_revealed == self.size - self.mines or \
+                (self.correct_flags == self.mines and not self.wrong_flags):
+            self.game_won()
+        return
+
+    def game_won(self):
+        """
+        Executes when the player wins the game, revealing every safe tile.
+        """
+        self.gameover = True
+        self.won = True
+        self.state[(self.state & MINE) == 0] |= REVEALED
+        self.safe_revealed = self.size - self.mines
+        return
+
+    def lose(self):
+        """
+        Executes when player loses the game, revealing the whole board.
+        """
+        self.gameover = True
+        self.state |= REVEALED
+        return
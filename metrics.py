@@ -0,0 +1,157 @@
+"""
+Difficulty metrics of Minesweeper boards, computed for many boards at once.
+
+    3BV         the fewest clicks which clear the board: one for each opening, and one for
+                each number not on the edge of an opening
+    openings    the connected regions of empty tiles, which a single click opens
+    islands     the connected groups of numbers not on the edge of an opening
+    guesses     the guesses the Solver needs to win the board from a start tile
+
+Openings and islands are found by connected component labelling of whole (K, H, W) arrays:
+every tile of a region takes the largest label around it, 3x3 neighborhood maxima at a time,
+and follows the label it takes to the label that tile has taken in turn, so labels settle
+in far fewer rounds than a region is long. The guesses are counted by playing each board
+with the Solver, one board at a time, so they cost far more than the other metrics and are
+only measured with --guesses.
+
+Usage:
+    python metrics.py [-n BOARDS] [--batch K] [--seed SEED] [--guesses] [BOARD ...]
+
+Created by Daniel Fay
+"""
+
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from batch import BATCH_SIZE, board_counts, deal
+from engine import DIFFICULTIES, Game
+from solver import Solver
+
+
+def _neighborhood_max(padded):
+    """
+    Return the maximum over the 3x3 neighborhood of every tile inside the one tile border of
+    the last two axes of padded.
+    """
+    rows = np.maximum(np.maximum(padded[..., :-2, :], padded[..., 1:-1, :]), padded[..., 2:, :])
+    return np.maximum(np.maximum(rows[..., :-2], rows[..., 1:-1]), rows[..., 2:])
+
+def label_regions(mask):
+    """
+    Label the regions of connected tiles, including diagonally, of every board of a
+    (..., H, W) mask.
+
+    Returns an array of the same shape holding, for each tile in the mask, one more than the
+    largest flat index into mask of a tile in its region, and 0 for every other tile.
+    """
+    dtype = np.int32 if mask.size < 2 ** 31 - 1 else np.int64
+    labels = np.arange(1, mask.size + 1, dtype=dtype).reshape(mask.shape) * mask
+    padded = np.zeros(mask.shape[:-2] + (mask.shape[-2] + 2, mask.shape[-1] + 2), dtype=dtype)
+
+    # The labels spread in a round are kept after a leading 0, so that looking up the label of
+    # the tile each label names gives 0 for the tiles outside the mask.
+    spread = np.zeros(mask.size + 1, dtype=dtype)
+    while True:
+        padded[..., 1:-1, 1:-1] = labels
+        np.multiply(_neighborhood_max(padded), mask, out=spread[1:].reshape(mask.shape))
+        jumped = spread[spread[1:]].reshape(mask.shape)
+        if (jumped == labels).all():
+            return labels
+        labels = jumped
+
+def count_regions(mask):
+    """
+    Return the number of regions of connected tiles of every board of a (..., H, W) mask.
+    """
+    labels = label_regions(mask)
+    return (labels == np.arange(1, mask.size + 1).reshape(mask.shape)).sum(axis=(-2, -1))
+
+def count_guesses(is_mine, start):
+    """
+    Return the guesses the Solver needs to win each board of a (K, H, W) mine mask from the
+    tile start, a flat index safe on every board, as a (K,) array.
+
+    The Solver plays each board with both of its rules and then the exact mine probabilities.
+    Whenever they leave it stuck it is given a lucky guess as in batch.solve, revealing the
+    first of its safe covered tiles with the fewest mines nearby.
+    """
+    count, height, width = is_mine.shape
+    guesses = np.zeros(count, dtype=np.int32)
+    for k in range(count):
+        game = Game(height, width, int(is_mine[k].sum()), board=is_mine[k])
+        solver = Solver(game)
+        solver.update(game.reveal(start).tolist())
+        while not game.gameover:
+            if solver.step() or solver.resolve():
+                continue
+            candidates = np.flatnonzero(~game.revealed & ~game.flagged & ~game.is_mine)
+            tile = int(candidates[np.argmin(game.counts[candidates])])
+            solver.update(game.reveal(tile).tolist())
+            guesses[k] += 1
+    return guesses
+
+def board_metrics(is_mine, counts=None, start=None):
+    """
+    Return the metrics of every board of a (K, H, W) mine mask, as a dict of (K,) arrays by
+    name: "bbbv", "openings" and "islands", and "guesses" if start, the flat index of a tile
+    safe on every board, is given.
+
+    counts are the adjacency counts of the boards, which are computed if not given.
+    """
+    if counts is None:
+        counts = board_counts(is_mine)
+    empty = ~is_mine & (counts == 0)
+    padded = np.zeros(is_mine.shape[:-2] + (is_mine.shape[-2] + 2, is_mine.shape[-1] + 2), dtype=bool)
+    padded[..., 1:-1, 1:-1] = empty
+    isolated = ~is_mine & ~_neighborhood_max(padded)
+
+    openings = count_regions(empty)
+    metrics = {
+        "bbbv": openings + isolated.sum(axis=(-2, -1)),
+        "openings": openings,
+        "islands": count_regions(isolated),
+    }
+    if start is not None:
+        metrics["guesses"] = count_guesses(is_mine, start)
+    return metrics
+
+def game_metrics(game):
+    """
+    Return the 3BV, openings and islands of a Game's board, as a dict of ints by name.
+    """
+    shape = (1, game.height, game.width)
+    metrics = board_metrics(game.is_mine.reshape(shape), game.counts.reshape(shape))
+    return {name: int(value[0]) for name, value in metrics.items()}
+
+def main(argv=None):
+    from simulate import parse_board
+
+    parser = argparse.ArgumentParser(description="Measure the difficulty of many Minesweeper boards.")
+    parser.add_argument("boards", nargs="*", type=parse_board, metavar="BOARD",
+                        help="difficulty name or HEIGHTxWIDTHxMINES size (default: every difficulty)")
+    parser.add_argument("-n", "--count", type=int, default=100_000, help="boards to measure for each size")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="boards measured together")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the boards")
+    parser.add_argument("--guesses", action="store_true", help="also count the guesses, one board at a time")
+    args = parser.parse_args(argv)
+
+    for name, height, width, mines in args.boards or [parse_board(name) for name in DIFFICULTIES]:
+        rng = np.random.default_rng(args.seed)
+        start = (height // 2) * width + width // 2
+        totals = {}
+        begin = perf_counter()
+        for done in range(0, args.count, args.batch):
+            boards = deal(min(args.batch, args.count - done), height, width, mines, rng, safe=start)
+            for metric, values in board_metrics(boards, start=start if args.guesses else None).items():
+                totals[metric] = totals.get(metric, 0) + int(values.sum())
+        elapsed = perf_counter() - begin
+        means = ", ".join(f"{metric} {total / args.count:.2f}" for metric, total in totals.items())
+        print(f"{name}: {means} ({args.count / elapsed:.0f} boards/s)")
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -5,269 +5,303 @@ Created by Daniel Fay
 """
 
 
+import os
+import queue
+import sys
+import threading
 from tkinter import *
-from PIL import Image, ImageTk
-from random import randint
-from copy import deepcopy
-import numpy as np
+from tkinter import filedialog
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, strftime
+
+import movelog
+import profiling
+from engine import Game, DIFFICULTIES
+from metrics import game_metrics
+from savefile import decode, load_game, save_game
+from scores import ScoreStore, bbbv_rate, board_name
+from sprites import load_sprites
+from solver import Hints, Solver
 
 # Declare global variables
-WIDTH = 16
-HEIGHT = 30
-MINES = 99
 difficulty = "expert"
 
 mode = 0
 elapsed = 0
-flags = 0
+tick = perf_counter()
+
+# Tk images of each sprite, by name, loaded once the window is built.
 photos = {}
 
-# Files is the list of names of image files to load. To add a new image, add the file name to files and 
-# the image will be loaded as an image object and mapped to the filename in photos
-files = ['1','2','3','4','5','6','7','8','blank','flag','mine','mine2','question','tile','mine_image']
+# Thread dealing the next game while the current one is played, and the settings and future
+# of the game it is dealing.
+dealer = ThreadPoolExecutor(max_workers=1)
+next_game = None
+
+# Tiles waiting to be redrawn, and the id of the idle callback which will draw them.
+dirty = set()
+pending_frame = None
+
+# Whether the end of the current game has been reported, which happens once per game.
+reported = False
+
+# Whether the current game has been replayed, autocompleted or played with hints, so that
+# winning it does not make the leaderboard.
+assisted = False
+
+# Directory each session's move log is written to.
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+
+# Records of the log being replayed, and the id of the callback making the next move, which
+# is None unless a log is being replayed.
+replay_queue = deque()
+replay_job = None
 
-gameover = False
 restart_time = False
 paused = False
 cheating = True
 cheatstring = 'aaaaaa'
 
-class Tile:
-    """
-    A single tile in a minesweeper board.
-    """
-    def __init__(self, pos):
-        """
-        Initialize a tile as a button at the specified grid location.
-        """
-        self._button = None
+# Moves decided by the autocomplete solver thread, waiting to be played, and the event which
+# stops it, which is None unless the solver is running.
+solver_moves = queue.SimpleQueue()
+solver_cancel = None
 
-        self.is_mine = False
-        self.flipped = False
-        self._isflag = False
-        self._isquestion = False
+# Milliseconds between batches of autocomplete moves, and the most time spent playing one.
+BATCH_INTERVAL = 15
+BATCH_TIME = 0.010
 
-        self._mines = 0
-        self._image = 'tile'
-        self._pos = pos
+# Hints shaded on the board while cheats are on, or None, and their shading as last worked
+# out, or None until it is next drawn.
+hints = None
+hint_shading = None
 
-    def make_widget(self):
-        """
-        Draw the tile at its set position on root.
-        """
-        # Draw the tile and set handlers for clicks.
-        self._button = Label(master=board, image=photos[self._image], relief=GROOVE)
-        self._button.bind("<Button-1>", self.click)
-        self._button.bind("<Button-3>", self._right_click)
-        self._button.grid(row=self._pos[0],column=self._pos[1])
-    
-    def set_flag(self, flag):
-        """
-        Add/remove flag and update tile image.
-        """
-        global flags
-        # Update flag count
-        flags -= int(self._isflag) - int(flag)
+# Shading of tiles proven safe and proven to be mines.
+SAFE_HINT = "#00c000"
+MINE_HINT = "#e00000"
 
-        self._isflag = flag
-        self._isquestion = False
+# Debug overlay showing the instrumentation statistics while cheats are on, and its table.
+stats_window = None
+stats_label = None
 
-        # Update tile image and mine counter
-        if flag:
-            self._image = 'flag'
-        else:
-            self._image = 'tile'
-        self._update_img()
-        update_flags()
+# Distance in pixels between the corners of neighboring tiles on the board canvas.
+TILE_SIZE = 18
 
-        return
+class BoardView:
+    """
+    Draws the game board as image items on a single canvas.
 
-    def _right_click(self, event):
+    One image item is kept for each tile, and the items are reused from game to game so
+    starting a new game never creates or destroys widgets.
+    """
+    def __init__(self, master):
         """
-        Event handler for right click on a tile.
-
-        Right click toggles tile in the following order: tile-flag-question-tile...
+        Create the board canvas and bind a single handler for each mouse button.
         """
-        global gameover, paused
-        if gameover or paused:
-            return
+        self.canvas = Canvas(master=master, width=0, height=0, highlightthickness=0,
+                             borderwidth=2, relief=GROOVE)
+        self.canvas.bind("<Button-1>", self._click)
+        self.canvas.bind("<Button-3>", self._right_click)
 
-        if not self.flipped:
-            if self._isflag:
-                self.set_question(True)
+        # Canvas item id and name of the image currently shown for each tile, by flat index.
+        self._items = []
+        self._images = []
+        self._shape = (0, 0)
 
-            elif self._isquestion:
-                self.set_question(False)
+        # Canvas item id and color of the hint shading on each shaded tile, by flat index.
+        self._shading = {}
 
-            else:
-                self.set_flag(True)
-
-        return
-
-    def set_question(self, quest):
+    def reset(self, shape):
         """
-        Add/remove a question mark from the tile and update the tile image.
+        Prepare the canvas to show a new game with the given shape, with every tile covered.
         """
-        global flags
-        self._isquestion = quest
+        height, width = shape
+        size = height * width
+        offset = int(self.canvas.cget('borderwidth'))
+
+        # Create any additional items the board needs, and hide any it does not.
+        while len(self._items) < size:
+            self._items.append(self.canvas.create_image(0, 0, anchor=NW, image=photos['tile']))
+            self._images.append('tile')
+        for item in self._items[size:]:
+            self.canvas.itemconfigure(item, state=HIDDEN)
+
+        if shape != self._shape:
+            self._shape = shape
+            for i in range(size):
+                row, col = divmod(i, width)
+                self.canvas.coords(self._items[i], offset + col * TILE_SIZE + 1, offset + row * TILE_SIZE + 1)
+                self.canvas.itemconfigure(self._items[i], state=NORMAL)
+            self.canvas.config(width=width * TILE_SIZE, height=height * TILE_SIZE)
+
+        # Only the tiles left uncovered by the last game need to be redrawn.
+        for i in range(size):
+            if self._images[i] != 'tile':
+                self._set_image(i, 'tile')
+        self.shade({})
+        return
 
-        if self._isflag:
-            flags -= 1
-            self._isflag = False
+    def shade(self, colors):
+        """
+        Shade each tile in colors, a dict of fill colors by flat index, over its image, and
+        clear the shading of every other tile.
 
-        # Update tile image and mine counter
-        if self._isquestion:
-            self._image = 'question'
-        else:
-            self._image = 'tile'
-        self._update_img()
-        update_flags()
+        Only shading which has changed is touched, so following a move costs little.
+        """
+        for i in [i for i in self._shading if i not in colors]:
+            self.canvas.delete(self._shading.pop(i)[0])
+        offset = int(self.canvas.cget('borderwidth'))
+        for i, color in colors.items():
+            shading = self._shading.get(i)
+            if shading is None:
+                row, col = divmod(i, self._shape[1])
+                x, y = offset + col * TILE_SIZE + 1, offset + row * TILE_SIZE + 1
+                item = self.canvas.create_rectangle(x, y, x + TILE_SIZE - 2, y + TILE_SIZE - 2, fill=color,
+                                                    stipple='gray50', width=0)
+                self._shading[i] = (item, color)
+            elif shading[1] != color:
+                self.canvas.itemconfigure(shading[0], fill=color)
+                self._shading[i] = (shading[0], color)
         return
 
-    def _update_img(self):
+    def draw(self, changed):
         """
-        Redraw the image for the tile.
+        Redraw the tiles with the given indices whose image no longer matches the game.
         """
-        self._button.config(image=photos[self._image])
-
-    def click(self, event=None):
-        # Stub handler for widget
-        pass
+        for i in changed:
+            image = tile_image(i)
+            if image != self._images[i]:
+                self._set_image(i, image)
+        return
 
-    def is_flag(self):
+    def _set_image(self, i, image):
         """
-        Return whether a flag is flagged.
+        Show the named image on tile i.
         """
-        return self._isflag
+        self._images[i] = image
+        self.canvas.itemconfigure(self._items[i], image=photos[image])
 
-    def change_cursor(self, strg):
+    def _tile_at(self, event):
         """
-        Set the button for the tile to have the given cursor option.
+        Return the flat index of the tile under the mouse for the given event, or None.
         """
-        self._button.config(cursor=strg)
-        return
-
-    def get_pos(self):
+        offset = int(self.canvas.cget('borderwidth'))
+        row = (self.canvas.canvasy(event.y) - offset) // TILE_SIZE
+        col = (self.canvas.canvasx(event.x) - offset) // TILE_SIZE
+        if 0 <= row < self._shape[0] and 0 <= col < self._shape[1]:
+            return int(row) * self._shape[1] + int(col)
+        return None
+
+    def _click(self, event):
         """
-        Return the position of the tile.
+        Event handler for left click on the board.
         """
-        return tuple(self._pos)
+        i = self._tile_at(event)
+        if i is not None:
+            click(i)
 
-    def get_mines_near(self):
+    def _right_click(self, event):
         """
-        Returns the number of mines adjacent to the tile.
+        Event handler for right click on the board.
         """
-        return self._mines
-    
-    
-class Mine(Tile):
-    def __init__(self, pos):
-        super(Mine, self).__init__(pos)
-        self.is_mine = True
-
-        self.make_widget()
-
-    def flip(self) -> list:
-        self._image = 'mine'
-        self._button.config(image=photos[self._image], command=None)
-        return []
-
-    def click(self, event=None):
-        if gameover or paused or self.flipped:
-            return
-        if not mode:
-            if not self._isflag:
-                self._button.config(image=photos["mine2"], command=None)
-                self.flipped = True
-                lose()
-        elif mode == 1:
-            self.set_flag(not self._isflag)
-        elif mode == 2:
-            self.set_question(not self._isquestion)
-
-class Number(Tile):
-    def __init__(self, pos, num):
-        super(Number, self).__init__(pos)
-        self._mines = num
-
-        self.make_widget()
-
-    def flip(self) -> list:
-        if not self.flipped: flipped = [self]
-        else: flipped = []
-        self.flipped = True
-
-        self._image = str(self._mines) if self._mines else 'blank'
-        self._button.config(image=photos[self._image], command=None)
-
-        if not self._mines:
-            flipped.extend(clear_adjacent(self._pos))
-
-        return flipped
-
-    def click(self, event=None):
-        if gameover or paused or self.flipped:
-            return
-
-        if not mode:
-            if not self._isflag:
-                self.flip()
-        elif mode == 1:
-            self.set_flag(not self._isflag)
-        elif mode == 2:
-            self.set_question(not self._isquestion)
+        i = self._tile_at(event)
+        if i is not None:
+            right_click(i)
 
 
-def create_board(height, width, mines):
+def tile_image(i):
     """
-    Create a board with the given height, width, and number of mines.
-    For each non-mine tile set the number of mines nearby.
+    Return the name of the image showing tile i of the current game.
     """
-    board = np.arange(height * width)
-    np.random.shuffle(board)
-    board = board.reshape((width, -1))
-    board[board >= height * width - mines] = -1
-
-    res = board.copy().astype('object')
-
-    dirs = [(1, 1), (1, 0), (1, -1), (0, 1), (0, -1), (-1, 1), (-1, 0), (-1, -1)]
-    for i, j in [(x, y) for x in range(width) for y in range(height)]:
-        if board[i, j] == -1:
-            res[i, j] = Mine((i, j))
-        else:
-            coords = filter(lambda x: 0 <= x[0] < width and 0 <= x[1] < height,
-                            map(lambda x: tuple(np.add((i, j), x)), dirs))
-            # print(sum(map(lambda x: int(board[x] == -1), coords)))
-            res[i, j] = Number( (i, j), sum(map(lambda x: int(board[x] == -1), coords)))
+    cell = game.cell(i)
+    if cell.revealed:
+        if cell.is_mine:
+            return 'mine2' if i == game.exploded else 'mine'
+        return str(cell.mines_near) if cell.mines_near else 'blank'
+    if cell.flagged:
+        return 'flag'
+    if cell.questioned:
+        return 'question'
+    return 'tile'
+
+def click(i):
+    """
+    Handle a left click on tile i.
 
-    return res
+    The action taken depends on the current selection mode. A move by the player stops
+    autocomplete, whose moves were worked out on the board as it was before.
+    """
+    if game.gameover or paused or replay_job is not None:
+        return
+    stop_autocomplete()
+    if not mode:
+        log_move(movelog.REVEAL, 0, i)
+        changed = game.reveal(i)
+    elif mode == 1:
+        flag = not game.cell(i).flagged
+        log_move(movelog.FLAG, flag, i)
+        changed = game.set_flag(i, flag)
+    else:
+        quest = not game.cell(i).questioned
+        log_move(movelog.QUESTION, quest, i)
+        changed = game.set_question(i, quest)
+    refresh(changed)
 
-def get_neighbors(board, pos):
+def right_click(i):
     """
-    Return the number of neighboring tiles which are mines.
+    Handle a right click on tile i.
+
+    Right click toggles tile in the following order: tile-flag-question-tile...
     """
-    return sum(map(lambda x: x.is_mine, neighbors(board[pos], board)))
+    if game.gameover or paused or replay_job is not None:
+        return
+    stop_autocomplete()
+    log_move(movelog.CYCLE, 0, i)
+    refresh(game.cycle_mark(i))
 
-def is_valid(row, col):
+def refresh(changed):
     """
-    Returns whether there is a tile at the given coordinates.
+    Mark the tiles with the given indices, and the mine counter, as needing to be redrawn.
+
+    Changes are collected and drawn together once Tk is idle, so a burst of moves costs a
+    single repaint instead of one per tile.
     """
-    global WIDTH, HEIGHT
-    if 0 <= row < HEIGHT and 0 <= col < WIDTH:
-        return True
-    return False
+    global pending_frame
+    dirty.update(map(int, changed))
+    if pending_frame is None:
+        pending_frame = root.after_idle(draw_frame)
+    return
 
-def clear_adjacent(pos):
+def draw_frame():
     """
-    Clears all neighboring empty tiles (tiles with 0 adjacent mines)
-    Flips each tile adjacent to itself, each of these tiles which is empty calls clear_adjacent again.
+    Redraw every tile changed since the last frame and update the mine counter.
+
+    Once the game has ended the whole board is redrawn, and the first frame after the end
+    reports the win or loss.
     """
-    flipped = []
-    nbrs = neighbors(gameboard[pos], gameboard)
-    for nbr in filter(lambda x: not x.flipped, nbrs):
-        flipped.extend(nbr.flip())
-    return flipped
+    global pending_frame, hint_shading, reported
+    pending_frame = None
+
+    view.draw(range(game.size) if game.gameover else dirty)
+    if hints is not None:
+        if game.gameover:
+            view.shade({})
+        elif dirty or hint_shading is None:
+            # The hints, and above all the hint probabilities, only change with the board.
+            hints.update(dirty)
+            hint_shading = hint_colors()
+            view.shade(hint_shading)
+    dirty.clear()
+    update_flags()
+
+    if game.gameover and not reported:
+        reported = True
+        if game.won:
+            game_won()
+        else:
+            lose()
+    return
 
 def toggle_mode(event=0):
     """
@@ -275,10 +309,18 @@ def toggle_mode(event=0):
 
     "event" input allows function to be called by event handlers.
     """
-    global mode, photos, gameover
-    if gameover:
+    if game.gameover or replay_job is not None:
         return
-    mode = (mode + 1) % 3
+    set_mode((mode + 1) % 3)
+    return
+
+def set_mode(new_mode):
+    """
+    Switch to the given selection mode.
+    """
+    global mode, photos
+    mode = new_mode
+    log_move(movelog.MODE, mode)
     if mode:
         if mode == 1:
             img = 'flag'
@@ -296,44 +338,20 @@ def update_flags():
     Note, this counts remaining mines according to what the player marks, not
     according to how many mines have/have not been correctly marked.
     """
-    global MINES, flags
-    flagcount.config(text="Remaining Mines:\n"+str(MINES-flags))
-    if flags == MINES:
-        check_win()
-    return
-
-def check_win():
-    """
-    Check if the player won the game.
-
-    Does not return anything.
-    """
-    global gameboard
-
-    for row in gameboard:
-        for tile in row:
-            if tile.is_mine:
-                if not tile.is_flag():
-                    return
-    game_won()
+    flagcount.config(text="Remaining Mines:\n"+str(game.remaining()))
     return
 
 def game_won():
     """
     Executes when the player wins the game.
     """
-    global gameboard, gameover, elapsed, difficulty
+    global elapsed
     score = elapsed
-    gameover = True
-    for row in gameboard:
-        for tile in row:
-            if not tile.is_mine:
-                tile.flip()
+    bbbv = game_metrics(game)["bbbv"]
     print ('Game Won!')
-    # if difficulty == "expert":
-    #     names, scores = load_scores()
-    #     if score < max(scores) or len(scores) < 10:
-    #         get_player_name(score)
+    print (f'3BV {bbbv}, {bbbv / max(game_time(), 1):.2f} 3BV/s')
+    if not assisted and score_store.qualifies(game.height, game.width, game.mines, score):
+        get_player_name(score, bbbv)
 
     return
 
@@ -341,11 +359,6 @@ def lose():
     """
     Executes when player loses the game.
     """
-    global gameboard, gameover
-    gameover = True
-
-    np.vectorize(lambda x: len(x.flip()))(gameboard)
-
     print ("Game Over, You Lose!")
 
 def time_str(elapsed):
@@ -358,35 +371,211 @@ def timer_update():
     """
     Update the game timer every second.
     """
-    global elapsed, gameover, gametimer, paused
-    if not gameover and not paused:
+    global elapsed, gametimer, paused, tick
+    if not game.gameover and not paused:
         elapsed += 1
+        tick = perf_counter()
         timer.config(text=time_str(elapsed))
     gametimer = timer.after(1000, timer_update)
     return
 
+def deal_game(difficulty, use_cache):
+    """
+    Return a new game at the given difficulty.
+
+    If use_cache is set the board is taken from the no-guess board cache, falling back on a
+    random board if the cache has none left. This is run on the dealer thread, so must not
+    touch any widgets.
+    """
+    height, width, mines = DIFFICULTIES[difficulty]
+    if use_cache:
+        import no_guess
+        game = no_guess.new_game(height, width, mines, difficulty)
+        if game is not None:
+            return game
+        print(f"No no-guess {difficulty} boards left, run no_guess.py to generate more.")
+    return Game(height, width, mines, difficulty)
+
+def prefetch():
+    """
+    Start dealing the next game for the current settings on the dealer thread.
+    """
+    global next_game
+    settings = (difficulty, no_guess_mode.get())
+    next_game = (settings, dealer.submit(deal_game, *settings))
+    return
+
+def discard_prefetch():
+    """
+    Drop the game dealt in the background, putting its board back in the no-guess board
+    cache if it was taken from there, as finding one takes hundreds of candidate boards.
+    """
+    global next_game
+    if next_game is not None:
+        (dealt_difficulty, use_cache), future = next_game
+        next_game = None
+        unused = future.result()
+        # Boards from the cache are given to the game rather than dealt from a seed.
+        if use_cache and unused.seed is None:
+            import no_guess
+            no_guess.BoardCache().add(unused.height, unused.width, unused.mines, [unused.is_mine])
+    return
+
+def take_game():
+    """
+    Return the game dealt in the background, or deal one now if the settings have changed
+    since, and start dealing the one after.
+    """
+    settings = (difficulty, no_guess_mode.get())
+    if next_game is not None and next_game[0] == settings:
+        new = next_game[1].result()
+    else:
+        discard_prefetch()
+        new = deal_game(*settings)
+    prefetch()
+    return new
+
 def restart(event=0):
     """
     On button click, resets game and time.
 
     "event" input allows function to be called by event handlers.
     """
-    global gameboard, flags, gameover, HEIGHT, WIDTH, MINES, gametimer, elapsed, paused
+    stop_replay()
+    start_game(take_game())
+    log.position(game, 0)
+    return
+
+def start_game(new, seconds=0):
+    """
+    Replace the current game with new, with the given seconds already elapsed in it.
+    """
+    global game, gametimer, elapsed, paused, hints, hint_shading, reported, assisted
+    stop_autocomplete()
     timer.after_cancel(gametimer)
-    for child in board.winfo_children():
-        child.destroy()
-    gameboard = create_board(HEIGHT, WIDTH, MINES)
+    game = new
+    reported = game.gameover
+    assisted = hints is not None
+    if hints is not None:
+        hints = Hints(game)
+        hint_shading = None
+    view.reset(game.shape)
+    dirty.clear()
+    refresh(range(game.size))
 
-    flags = 0
-    gameover = False
     paused = False
+    state.config(text='')
+    pause.config(relief=RAISED, overrelief=FLAT)
 
     update_flags()
 
-    elapsed = -1
+    elapsed = int(seconds) - 1
     timer_update()
     return
 
+def game_time():
+    """
+    Return the seconds of play in the current game, to a fraction of a second.
+    """
+    if game.gameover or paused:
+        return elapsed
+    return elapsed + min(perf_counter() - tick, 0.999)
+
+def log_move(action, arg=0, tile=0):
+    """
+    Append a move made by the player to the session's move log.
+    """
+    if replay_job is None:
+        log.record(game_time(), action, int(arg), tile)
+    return
+
+def replay(event=0):
+    """
+    Replay a move log chosen by the player, in real time.
+    """
+    global replay_job
+    path = filedialog.askopenfilename(title="Replay Log", filetypes=[("Move logs", "*.mlog")])
+    if not path:
+        return
+    stop_replay()
+    replay_queue.extend(movelog.read_log(path))
+    if replay_queue:
+        replay_job = root.after_idle(replay_step)
+    return
+
+def replay_step():
+    """
+    Make the next move of the log being replayed and schedule the one after it for the
+    same game time later.
+    """
+    global replay_job, elapsed, assisted
+    time, action, arg, tile = replay_queue.popleft()
+    if action in (movelog.RESTART, movelog.POSITION):
+        start_game(*decode(tile))
+    elif action == movelog.MODE:
+        set_mode(arg)
+    elif action == movelog.PAUSE:
+        if paused != bool(arg):
+            pause_game()
+    else:
+        refresh(movelog.play(game, action, arg, tile))
+    assisted = True
+    elapsed = int(time)
+    timer.config(text=time_str(elapsed))
+
+    replay_job = None
+    if replay_queue:
+        next_time, next_action = replay_queue[0][:2]
+        delay = 0 if next_action == movelog.RESTART else max(0.0, next_time - time)
+        replay_job = root.after(int(1000 * delay), replay_step)
+    else:
+        # The player may play on from where the replay ended.
+        log.position(game, elapsed)
+    return
+
+def stop_replay():
+    """
+    Stop replaying a move log, if one is being replayed, and log the position it stopped at.
+    """
+    global replay_job
+    if replay_job is not None:
+        root.after_cancel(replay_job)
+        replay_job = None
+        log.position(game, elapsed)
+    replay_queue.clear()
+    return
+
+def save(event=0):
+    """
+    Save the current game and time to a file chosen by the player.
+    """
+    path = filedialog.asksaveasfilename(title="Save Game", defaultextension=".mswp",
+                                        filetypes=[("Minesweeper games", "*.mswp")])
+    if path:
+        save_game(game, path, elapsed)
+    return
+
+def load(event=0):
+    """
+    Replace the current game with one loaded from a file chosen by the player.
+    """
+    global difficulty
+    path = filedialog.askopenfilename(title="Load Game", filetypes=[("Minesweeper games", "*.mswp")])
+    if not path:
+        return
+    try:
+        loaded, seconds = load_game(path)
+    except ValueError as e:
+        print(e)
+        return
+
+    stop_replay()
+    if loaded.difficulty in DIFFICULTIES:
+        difficulty = loaded.difficulty
+    start_game(loaded, seconds)
+    log.position(game, seconds)
+    return
+
 def instruct(event=0):
     """
     Opens the instructions menu.
@@ -426,6 +615,8 @@ def pause_game(event=0):
     """
     global paused
     paused = not paused
+    log_move(movelog.PAUSE, paused)
+    stop_autocomplete()
     if paused:
         state.config(text='Paused')
         pause.config(relief=SUNKEN, overrelief=SUNKEN)
@@ -452,27 +643,119 @@ def cheat():
     """
     Toggles cheat feature. Used primarily for debugging, but can also be implemented to create cheat codes.
     """
-    global cheating, gameboard, auto
+    global cheating, auto
     cheating = not cheating
     if cheating:
         auto.grid()
     else:
         auto.grid_remove()
+
+    # The debug overlay and hints start off, and are toggled on their own.
+    if hints is None:
+        show_stats()
+        start_hints()
+    else:
+        hide_stats()
+        stop_hints()
+    return
+
+def start_hints():
+    """
+    Start shading the tiles which can be proven safe or proven to be mines.
+    """
+    global hints, hint_shading, assisted
+    hints = Hints(game)
+    assisted = True
+    hint_shading = None
+    refresh(())
+    return
+
+def stop_hints():
+    """
+    Stop shading hints on the board.
+    """
+    global hints
+    hints = None
+    view.shade({})
     return
 
-def load_scores():
+def toggle_probabilities():
+    """
+    Show or hide the hint probabilities, following the Hint Probabilities option.
     """
-    Load high scores from text file.
+    global hint_shading
+    hint_shading = None
+    refresh(())
+    return
+
+def hint_colors():
     """
-    names = []
-    scores = []
-    data = open(".\\high_scores.txt", 'r')
-    for line in data.readlines():
-        score = line.split(",")
-        names.append(score[0])
-        scores.append(int(score[1]))
-    data.close()
-    return names, scores
+    Return the shading of each tile with a hint, by flat index.
+
+    If hint probabilities are on, every other covered tile next to a number is shaded from
+    green to red by its chance of being a mine.
+    """
+    colors = dict.fromkeys(hints.safe, SAFE_HINT)
+    colors.update(dict.fromkeys(hints.hidden_mines(), MINE_HINT))
+    if hint_probabilities.get():
+        weights, interior, interior_weight, total = hints.weights.get()
+        for i, weight in weights.items():
+            if i not in colors and total:
+                p = round(10 * weight / total) / 10
+                colors[i] = f"#{int(255 * p):02x}{int(192 * (1 - p)):02x}00"
+    return colors
+
+def show_stats():
+    """
+    Turn on instrumentation and open the debug overlay showing its statistics.
+    """
+    global stats_window, stats_label
+    profiling.enable()
+    if stats_window is not None:
+        return
+    stats_window = Toplevel(master=root)
+    stats_window.title("Profile")
+    stats_window.protocol("WM_DELETE_WINDOW", hide_stats)
+
+    stats_label = Label(master=stats_window, font="TkFixedFont", justify=LEFT, anchor=NW)
+    stats_label.grid(columnspan=2, padx=5, pady=5, sticky=W+E)
+    reset = Button(master=stats_window, text="Reset", command=profiling.reset, overrelief=FLAT)
+    reset.grid(row=1, column=0, pady=5)
+    export = Button(master=stats_window, text="Export JSON", command=export_stats, overrelief=FLAT)
+    export.grid(row=1, column=1, pady=5)
+
+    update_stats()
+    return
+
+def update_stats():
+    """
+    Refresh the debug overlay every second while it is open.
+    """
+    if stats_window is not None:
+        stats_label.config(text="\n".join(profiling.report()))
+        stats_window.after(1000, update_stats)
+    return
+
+def hide_stats():
+    """
+    Close the debug overlay and turn off instrumentation.
+    """
+    global stats_window
+    profiling.disable()
+    if stats_window is not None:
+        stats_window.destroy()
+        stats_window = None
+    return
+
+def export_stats():
+    """
+    Save the instrumentation statistics to a JSON file chosen by the player.
+    """
+    path = filedialog.asksaveasfilename(title="Export Profile", defaultextension=".json",
+                                        filetypes=[("JSON", "*.json")])
+    if path:
+        profiling.export(path)
+    return
 
 def high_scores():
     """
@@ -484,31 +767,35 @@ def high_scores():
         p = True
         pause_game()
 
-    names, scores = load_scores()
+    board = board_name(game.height, game.width, game.mines)
     high = Toplevel()
     high.title("High Scores!")
     count = 0
     frame = Frame(master=high)
     frame.grid(padx=10, pady=10)
 
-    head = Label(master=frame, text="High Scores!")
-    head.grid(row=0, columnspan=3)
+    head = Label(master=frame, text=f"High Scores! ({board})")
+    head.grid(row=0, columnspan=4)
 
     c1 = LabelFrame(master=frame, width=50)
     c2 = LabelFrame(master=frame, width=100)
     c3 = LabelFrame(master=frame, width=50)
+    c4 = LabelFrame(master=frame, width=50)
     c1.grid(column=0, row=1, rowspan=10)
     c2.grid(column=1, row=1, rowspan=10)
     c3.grid(column=2, row=1, rowspan=10)
+    c4.grid(column=3, row=1, rowspan=10)
 
-    for name, score in zip(names, scores):
+    for name, score, bbbv in score_store.top(game.height, game.width, game.mines):
         num = Label(master=c1, text=str(count + 1), relief=SUNKEN, padx=10, pady=5)
         pname = Label(master=c2, text=name, relief=SUNKEN, padx=10, pady=5)
         pscore = Label(master=c3, text=time_str(score), relief=SUNKEN, padx=10, pady=5)
+        prate = Label(master=c4, text=bbbv_rate(bbbv, score), relief=SUNKEN, padx=10, pady=5)
 
         num.grid(row=count, sticky=W+E)
         pname.grid(row=count, sticky=W+E)
         pscore.grid(row=count, sticky=W+E)
+        prate.grid(row=count, sticky=W+E)
         count += 1
 
     done = Button(master=high, text="Exit", overrelief=FLAT, command=high.destroy)
@@ -519,36 +806,18 @@ def high_scores():
         pause_game()
     return
 
-def add_high_score(name, score):
+def add_high_score(name, score, bbbv):
     """
-    Add a score and name to the high score list.
+    Add a score and name, with the 3BV of the board, to the high score list of the current
+    board size.
     """
-    names, scores = load_scores()
-    for i in range(len(scores)):
-        if score < scores[i]:
-            scores.insert(i, score)
-            names.insert(i, name)
-            break
-    if len(scores) > 10:
-        scores.pop()
-        names.pop()
-
-    strg = ''
-    for name, score in zip(names, scores):
-        strg += name + ',' + str(score) + '\n'
-
-    data = open(".\\high_scores.txt", 'w')
-    data.truncate()			# Overwrite existing file
-
-    data.write(strg)
-    data.close()
-
+    score_store.add(game.height, game.width, game.mines, name, score, bbbv)
     high_scores()
     return
 
-def get_player_name(score):
+def get_player_name(score, bbbv):
     """
-    Get a name and pass that name and the score to add_high_scores.
+    Get a name and pass that name, the score and the 3BV of the board to add_high_scores.
     """
     get_name = Toplevel()
     frame = Frame(master=get_name)
@@ -565,19 +834,7 @@ def get_player_name(score):
     enter.grid(row=2)
 
     get_name.wait_window(window=get_name)
-    add_high_score(txt.get(), score)
-
-def neighbors(tile, game_board):
-    """
-    Return a list of the neighbors of a given tile in board.
-    """
-    pos = tile.get_pos()
-
-    coords = list(filter(lambda x: np.all(np.array((0,0)) <= x) and np.all(x < np.array(gameboard.shape)),
-                    [tuple(np.add(pos,(i,j))) for i in range(-1,2)
-                                   for j in range(-1,2) if i or j]))
-
-    return {gameboard[x] for x in coords}
+    add_high_score(txt.get(), score, bbbv)
 
 class Modes:
     @staticmethod
@@ -585,10 +842,7 @@ class Modes:
         """
         Starts a new game with beginner difficulty settings.
         """
-        global HEIGHT, WIDTH, MINES, difficulty
-        HEIGHT = 8
-        WIDTH = 8
-        MINES = 10
+        global difficulty
         difficulty = "beginner"
         restart()
 
@@ -597,10 +851,7 @@ class Modes:
         """
         Starts a new game with intermediate difficulty settings.
         """
-        global HEIGHT, WIDTH, MINES, difficulty
-        HEIGHT = 16
-        WIDTH = 16
-        MINES = 40
+        global difficulty
         difficulty = "intermediate"
         restart()
 
@@ -609,178 +860,201 @@ class Modes:
         """
         Starts a new game with expert difficulty settings.
         """
-        global HEIGHT, WIDTH, MINES, difficulty
-        HEIGHT = 30
-        WIDTH = 16
-        MINES = 99
+        global difficulty
         difficulty = "expert"
         restart()
 
 
-def get_cluster(game_board, node, curnodes):
-    nbrs = list(filter(lambda x: not x.flipped and x not in curnodes, neighbors(node, game_board)))
-    for nbr in nbrs:
-        curnodes.append(nbr)
-    for nbr in nbrs:
-        get_cluster(game_board, nbr, curnodes)
-
-
-
-def ai_playgame(event=None):
-    """
-    Automated solver.
-    """
-
-    q = deque([])
-    others = []
-
-    while True:
-        changed = False
-        for i in np.ndindex(*gameboard.shape):
-            if gameboard[i].flipped: q.append(gameboard[i])
-
-        while q:
-            tile = q.pop()
-            if tile.get_mines_near():
-                n = tile.get_mines_near()
-                nbrs = neighbors(tile, gameboard)
-
-                if n and sum(map(lambda x: not x.flipped, nbrs)) == n:
-                    for nbr in filter(lambda x: not (x.flipped or x.is_flag()), nbrs):
-                        nbr.set_flag(True)
-                        q.extend(neighbors(nbr, gameboard))
-                        changed = True
-                elif n and sum(map(lambda x: x.is_flag(), nbrs)) == n:
-                    for nbr in filter(lambda x: not (x.flipped or x.is_flag()), nbrs):
-                        q.extend(nbr.flip())
-                        q.extend(neighbors(nbr, gameboard))
-                        changed = True
-                elif n: others.append(tile)
-
-            # After all easy solutions have been exhausted, attempt harder ones
-            while others:
-                tile = others.pop()
-                n = tile.get_mines_near()
-                nbrs = neighbors(tile, gameboard)
-                unflipped, flipped = list(filter(lambda x: not x.flipped, nbrs)), list(filter(lambda x: x.flipped, nbrs))
-
-                if unflipped and flipped:
-                    for nbr in flipped:
-                        n2 = nbr.get_mines_near()
-                        nbrs2 = list(filter(lambda x: not x.flipped, neighbors(nbr, gameboard)))
-                        shared = set(unflipped).intersection(set(nbrs2))
-
-                        if shared == set(nbrs2) or min(map(lambda x: x.is_flag(), set(nbrs2).difference(shared))):
-                            n3 = n - (n2 - sum(map(lambda x: x.is_flag(), set(nbrs2).difference(shared))))
-                            not_shared = set(unflipped).difference(shared)
-                            if n3 == sum(map(lambda x: x.is_flag(), not_shared)):
-                                for t in not_shared:
-                                    if not t.is_flag():
-                                        q.extend(t.flip())
-                                        changed = True
-        if not changed: break
-
-    # Fuck
-    ### Identify clusters of tiles and attempt to analyze probabilities
-    tiles = [gameboard[i] for i in np.ndindex(*gameboard.shape)
-             if not gameboard[i].flipped and not gameboard[i].is_flag()]
-    print(len(tiles))
-    all_clusters = []
-    while tiles:
-        tile = tiles.pop()
-        if not filter(lambda x: not x.flipped and not x.is_flag(), neighbors(tile, gameboard)): continue
-        cluster = []
-        get_cluster(gameboard, tile, cluster)
-        if filter(lambda x: not x.is_flag(), cluster):
-            all_clusters.append(
-                list(filter(lambda x:
-                            max(map(lambda y: y.flipped, neighbors(x, gameboard))),
-                            cluster))
-            )
-        for t in cluster:
-            if t in tiles: tiles.remove(t)
+def autocomplete(event=None):
+    """
+    Start the automated solver on a worker thread, playing on a snapshot of the current game.
+
+    The moves it decides are streamed back through solver_moves and played in batches on
+    the Tk thread, so the window stays responsive. Pausing, a move by the player or starting
+    another game stops the solver.
+    """
+    global solver_moves, solver_cancel
+    if game.gameover or paused or replay_job is not None or solver_cancel is not None:
+        return
+    solver_moves = queue.SimpleQueue()
+    solver_cancel = threading.Event()
+    threading.Thread(target=run_solver, args=(game.copy(), solver_moves, solver_cancel), daemon=True).start()
+    root.after(BATCH_INTERVAL, play_solver_moves, solver_moves, solver_cancel)
+    return
 
+def run_solver(snapshot, moves, cancel):
+    """
+    Solve the snapshot, putting each round of moves on the moves queue until done or
+    cancelled, then None. Runs on the solver thread, so must not touch the current game or
+    any widgets.
+    """
+    try:
+        for safe, mines in Solver(snapshot).moves():
+            if cancel.is_set():
+                break
+            moves.put((safe, mines))
+    finally:
+        # Even if the solver fails, so that autocomplete can be started again.
+        moves.put(None)
+    return
+
+def play_solver_moves(moves, cancel):
+    """
+    Play the rounds of moves waiting on the moves queue, for at most BATCH_TIME seconds,
+    and check back for more until the solver finishes or is stopped.
+    """
+    global solver_cancel, assisted
+    if cancel.is_set():
+        return
+    changed = []
+    deadline = perf_counter() + BATCH_TIME
+    while perf_counter() < deadline:
+        try:
+            rounds = moves.get_nowait()
+        except queue.Empty:
+            break
+        if rounds is None:
+            solver_cancel = None
+            refresh(changed)
+            return
+        safe, mines = rounds
+        assisted = True
+        for i in mines:
+            log_move(movelog.FLAG, True, i)
+            changed.extend(game.set_flag(i, True))
+        for i in safe:
+            log_move(movelog.REVEAL, 0, i)
+            changed.extend(game.reveal(i).tolist())
+    refresh(changed)
+    root.after(BATCH_INTERVAL, play_solver_moves, moves, cancel)
+    return
 
+def stop_autocomplete():
+    """
+    Stop the automated solver, if it is running. Moves it has decided but not yet played
+    are dropped.
+    """
+    global solver_cancel
+    if solver_cancel is not None:
+        solver_cancel.set()
+        solver_cancel = None
+    return
 
 
+# Redraws timed by the instrumentation, besides the engine and solver.
+profiling.hook(BoardView, "draw", "ui.draw", lambda args, result: len(args[1]))
+profiling.hook(sys.modules[__name__], "draw_frame", "ui.frame")
 
 
-# Initialize a new window and add a frame
-root = Tk()	
-root.title("Minesweeper!")
-board = Frame(master=root, height=750, width=256)
-board.grid(padx=5, pady=5, rowspan=10)
+def main():
+    """
+    Build the window and play until it is closed.
+    """
+    global root, photos, score_store, log, no_guess_mode, hint_probabilities, game, view
+    global mode_select, timer, gametimer, flagcount, pause, state, auto
+
+    # Initialize a new window
+    root = Tk()
+    root.title("Minesweeper!")
+
+    # Every sprite is sliced from a single atlas, decoded once.
+    photos = load_sprites(root)
+
+    # Leaderboards of every board size.
+    score_store = ScoreStore()
+
+    # Every move of the session is appended to a new move log.
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log = movelog.MoveLog(os.path.join(LOG_DIR, strftime("%Y%m%d-%H%M%S") + ".mlog"))
+
+
+    # Set space bar to toggle selection modes.
+    root.focus_set()
+    root.bind("<space>", toggle_mode)
+    root.bind("<Key>", cheat_handler)
+    root.bind("r", restart)
+
+    # Whether new games are dealt from the no-guess board cache
+    no_guess_mode = BooleanVar(master=root, value=False)
+
+    # Whether hints also shade each tile by its chance of being a mine
+    hint_probabilities = BooleanVar(master=root, value=False)
+
+    # Options Menu
+    menubar = Menu(root, tearoff=0)
+    options = Menu(menubar, tearoff=0)
+    options.add_command(label="Beginner", command=Modes.beginner)
+    options.add_command(label="Intermediate", command=Modes.intermediate)
+    options.add_command(label="Expert", command=Modes.expert)
+    options.add_separator()
+    options.add_checkbutton(label="No Guess Boards", variable=no_guess_mode, command=restart)
+    options.add_checkbutton(label="Hint Probabilities", variable=hint_probabilities, command=toggle_probabilities)
+    options.add_separator()
+    options.add_command(label="Restart Game", command=restart)
+    options.add_command(label="Save Game", command=save)
+    options.add_command(label="Load Game", command=load)
+    options.add_command(label="Replay Log", command=replay)
+    options.add_separator()
+    options.add_command(label="Exit", command=root.destroy)
+    menubar.add_cascade(label="Options", menu=options)
+
+    help = Menu(menubar, tearoff=0)
+    help.add_command(label="Instructions", command=instruct)
+    help.add_command(label="High Scores", command=high_scores)
+    menubar.add_cascade(label="Info", menu=help)
+
+    root.config(menu=menubar)
+
+
+    # game holds the state of the current board, view draws it on a canvas.
+    game = take_game()
+    log.position(game, 0)
+    view = BoardView(root)
+    view.canvas.grid(padx=5, pady=5, rowspan=10)
+    view.reset(game.shape)
+
+    # Setup additional game components to the right of the gameboard
+    info = Label(master=root, image=photos['mine_image'], text="Minesweeper!\nCreated By: Daniel Fay", compound=TOP)
+    info.grid(column=1, row=0, columnspan=4, pady=10, padx=5)
+
+
+    # Parent frame for game controls
+    controls = LabelFrame(master=root, background='Black')
+    controls.grid(column=1, row=2, padx=10, columnspan=4)
+
+    # Button to toggle selection modes
+    mode_select = Button(master=controls, width=60, height=40, text='Mode', image=photos['blank'], compound=BOTTOM, command=toggle_mode, overrelief=FLAT)
+    mode_select.grid(columnspan=2, rowspan=2, sticky=W+E+N+S, pady=2, padx=2)
+
+    # Displays elapsed game time
+    timer = Label(master=controls,text=time_str(elapsed), relief=RIDGE)
+    timer.grid(sticky=W+E, pady=2, padx=2)
+    gametimer = timer.after(1000, timer_update)
 
+    # Displays how many flags remain (ie, how many mines are unmarked assuming all flags correctly mark a mine)
+    flagcount = Label(master=controls, text="Remaining Mines:\n"+str(game.remaining()), relief=RIDGE)
+    flagcount.grid(rowspan=2, sticky=W+E, pady=2, padx=2)
 
-# Store each image used as a tkinter photo object, mapped to its file name.
-for filename in files:
-    with Image.open(".\\Sprites\\" + filename + ".png") as image:
-        photos[filename] = ImageTk.PhotoImage(image)
-
-
-# Set space bar to toggle selection modes.
-root.focus_set()
-root.bind("<space>", toggle_mode)
-root.bind("<Key>", cheat_handler)
-root.bind("r", restart)
+    # Pauses the game
+    pause = Button(master=controls, text="Pause", command=pause_game, overrelief=FLAT)
+    pause.grid(sticky=W+E, pady=2, padx=2)
 
-# Options Menu
-menubar = Menu(root, tearoff=0)
-options = Menu(menubar, tearoff=0)
-options.add_command(label="Beginner", command=Modes.beginner)
-options.add_command(label="Intermediate", command=Modes.intermediate)
-options.add_command(label="Expert", command=Modes.expert)
-options.add_separator()
-options.add_command(label="Restart Game", command=restart)
-options.add_separator()
-options.add_command(label="Exit", command=root.destroy)
-menubar.add_cascade(label="Options", menu=options)
-
-help = Menu(menubar, tearoff=0)
-help.add_command(label="Instructions", command=instruct)
-help.add_command(label="High Scores", command=high_scores)
-menubar.add_cascade(label="Info", menu=help)
-
-root.config(menu=menubar)
-
-
-# gameboard is a 2D array of Tile objects.
-gameboard = create_board(HEIGHT, WIDTH, MINES)
-
-# Setup additional game components to the right of the gameboard
-info = Label(master=root, image=photos['mine_image'], text="Minesweeper!\nCreated By: Daniel Fay", compound=TOP)
-info.grid(column=WIDTH, row=0, columnspan=4, pady=10, padx=5)
-
-
-# Parent frame for game controls
-controls = LabelFrame(master=root, background='Black')
-controls.grid(column=WIDTH, row=2, padx=10, columnspan=4)
-
-# Button to toggle selection modes
-mode_select = Button(master=controls, width=60, height=40, text='Mode', image=photos['blank'], compound=BOTTOM, command=toggle_mode, overrelief=FLAT)
-mode_select.grid(columnspan=2, rowspan=2, sticky=W+E+N+S, pady=2, padx=2)
-
-# Displays elapsed game time
-timer = Label(master=controls,text=time_str(elapsed), relief=RIDGE)
-timer.grid(sticky=W+E, pady=2, padx=2)
-gametimer = timer.after(1000, timer_update)
-
-# Displays how many flags remain (ie, how many mines are unmarked assuming all flags correctly mark a mine)
-flagcount = Label(master=controls, text="Remaining Mines:\n"+str(MINES - flags), relief=RIDGE)
-flagcount.grid(rowspan=2, sticky=W+E, pady=2, padx=2)
+    # Displays whether the game is currently paused
+    state = Label(master=root, text='')
+    state.grid(row=1, column=1, columnspan=4)
 
-# Pauses the game
-pause = Button(master=controls, text="Pause", command=pause_game, overrelief=FLAT)
-pause.grid(sticky=W+E, pady=2, padx=2)
 
-# Displays whether the game is currently paused
-state = Label(master=root, text='')
-state.grid(row=1, column=WIDTH, columnspan=4)
+    auto = Button(master=controls, text="Autocomplete", command=autocomplete, overrelief=FLAT)
+    auto.grid(sticky=W+E, pady=2, padx=2)
+    # auto.grid_remove()
 
 
-auto = Button(master=controls, text="Autocomplete", command=ai_playgame, overrelief=FLAT)
-auto.grid(sticky=W+E, pady=2, padx=2)
-# auto.grid_remove()
+    root.mainloop()
+    discard_prefetch()
+    log.close()
+    score_store.close()
+    return
 
 
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
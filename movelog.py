@@ -0,0 +1,151 @@
+"""
+Streaming log of the moves made in games of Minesweeper, and a replay engine for it.
+
+A log is a stream of fixed size records, each holding the time of a move in seconds of
+game time, its action, an argument and a tile. A RESTART record starts a new game, and is
+followed by the save file of the position play starts from, with its size in place of the
+tile. Moves made by autocomplete are logged one by one like the player's. Records are
+appended through a buffered file, so logging a move costs a few microseconds, and a log cut
+short by a crash is read up to its last whole record.
+
+Usage:
+    python movelog.py LOG ...
+
+replays every game of each log on the headless engine as fast as it can and reports the
+results.
+
+Created by Daniel Fay
+"""
+
+
+import struct
+import sys
+from time import perf_counter
+
+from savefile import decode, encode
+
+# Layout of a record: time, action, argument and tile.
+RECORD = struct.Struct("<fBBI")
+
+# Actions of a record. The argument of FLAG and QUESTION is whether the mark is added, of
+# MODE the selection mode switched to and of PAUSE whether the game is paused.
+RESTART = 0
+REVEAL = 2
+FLAG = 3
+QUESTION = 4
+CYCLE = 5
+MODE = 6
+PAUSE = 7
+
+# Older logs jumped the current game to a new position after an autocomplete with a
+# POSITION record, followed by a save file like a RESTART record. It is no longer written,
+# but is still read so that those logs replay.
+POSITION = 1
+
+# Bytes buffered before a log is written to disk.
+BUFFER_SIZE = 1 << 16
+
+
+class MoveLog:
+    """
+    Appends records to a log file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab", buffering=BUFFER_SIZE)
+
+    def record(self, time, action, arg=0, tile=0):
+        """
+        Append a move made at the given game time.
+        """
+        self._file.write(RECORD.pack(time, action, arg, tile))
+        return
+
+    def position(self, game, time):
+        """
+        Append the position of the game at the given game time, as the start of a new game.
+        """
+        data = encode(game, time)
+        self._file.write(RECORD.pack(time, RESTART, 0, len(data)))
+        self._file.write(data)
+        return
+
+    def flush(self):
+        self._file.flush()
+        return
+
+    def close(self):
+        self._file.close()
+        return
+
+
+def read_log(path):
+    """
+    Read the log at path.
+
+    Returns its records as (time, action, arg, tile) tuples. The tile of a RESTART or
+    POSITION record is replaced by the save file following it.
+    """
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+    records = []
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        time, action, arg, tile = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if action in (RESTART, POSITION):
+            if offset + tile > len(data):
+                break
+            tile, offset = data[offset:offset + tile], offset + tile
+        records.append((time, action, arg, tile))
+    return records
+
+def play(game, action, arg, tile):
+    """
+    Make the move of a record on the game and return the indices of the changed tiles.
+
+    MODE and PAUSE records only change the UI, so do nothing here.
+    """
+    if action == REVEAL:
+        return game.reveal(tile)
+    if action == FLAG:
+        return game.set_flag(tile, bool(arg))
+    if action == QUESTION:
+        return game.set_question(tile, bool(arg))
+    if action == CYCLE:
+        return game.cycle_mark(tile)
+    return []
+
+def replay(records):
+    """
+    Replay the records of a log on the headless engine as fast as possible.
+
+    Returns the game each RESTART record started, as it was left at the end of the log.
+    """
+    games = []
+    game = None
+    for time, action, arg, tile in records:
+        if action in (RESTART, POSITION):
+            if action == RESTART and game is not None:
+                games.append(game)
+            game, elapsed = decode(tile)
+        elif game is not None:
+            play(game, action, arg, tile)
+    if game is not None:
+        games.append(game)
+    return games
+
+def main(argv=None):
+    for path in (sys.argv[1:] if argv is None else argv):
+        records = read_log(path)
+        start = perf_counter()
+        games = replay(records)
+        elapsed = perf_counter() - start
+        moves = sum(action not in (RESTART, POSITION) for time, action, arg, tile in records)
+        print(f"{path}: {len(games)} games, {sum(game.won for game in games)} won, {moves} moves "
+              f"replayed in {1000 * elapsed:.1f} ms ({len(games) / max(elapsed, 1e-9):.0f} games/s)")
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Generator and on-disk cache of boards which can be solved without guessing.
+
+A candidate board is dealt with its first click, in the middle of the board, guaranteed to
+open an empty region. The solver then plays it from that click, using only deductions which
+are certain, and the board is kept only if the solver wins. Most candidates are rejected,
+so they are generated on a process pool and the boards found are stored in a cache, to be
+served instantly when a game starts.
+
+Usage:
+    python no_guess.py [-n BOARDS] [-w WORKERS] [--seed SEED] [BOARD ...]
+
+adds the given number of boards to the cache for each board size, written as a difficulty
+name or HEIGHTxWIDTHxMINES.
+
+Created by Daniel Fay
+"""
+
+
+import argparse
+import os
+import time
+from contextlib import contextmanager
+from multiprocessing import Pool
+
+import numpy as np
+
+from engine import Game, DIFFICULTIES, create_board
+from simulate import parse_board
+from solver import Solver
+
+# Default location of the board cache, next to this file.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "board_cache")
+
+# Candidate boards each generator task tries before reporting back.
+ATTEMPTS_PER_TASK = 50
+
+# Seconds after which the lock of a cache file is taken to have been left by a process which
+# died holding it. Adding or taking boards holds it for far less.
+LOCK_TIMEOUT = 10.0
+
+
+def first_click(height, width):
+    """
+    Return the flat index of the tile a no-guess game starts from.
+    """
+    return (height // 2) * width + width // 2
+
+def is_no_guess(height, width, mines, board, start):
+    """
+    Return whether the solver wins the game on the given board without guessing, starting
+    from a click on the tile start.
+    """
+    game = Game(height, width, mines, board=board)
+    game.reveal(start)
+    Solver(game).solve()
+    return game.won
+
+def search(args):
+    """
+    Deal up to ATTEMPTS_PER_TASK seeded candidate boards, stopping at the first one which
+    can be solved without guessing.
+
+    Returns that board's mine mask, or None, and the number of candidates tried.
+    """
+    height, width, mines, seed = args
+    rng = np.random.default_rng(seed)
+    start = first_click(height, width)
+    for attempt in range(1, ATTEMPTS_PER_TASK + 1):
+        board, counts = create_board(height, width, mines, safe=start, rng=rng)
+        if is_no_guess(height, width, mines, board, start):
+            return board, attempt
+    return None, ATTEMPTS_PER_TASK
+
+def generate(height, width, mines, count, pool, seed=0):
+    """
+    Find the given number of no-guess boards using the pool.
+
+    Returns the boards' mine masks and the number of candidates tried.
+    """
+    boards = []
+    attempts = 0
+    task = seed
+    while len(boards) < count:
+        batch = [(height, width, mines, task + n) for n in range(4 * (os.cpu_count() or 1))]
+        task += len(batch)
+        for board, tried in pool.imap(search, batch):
+            attempts += tried
+            if board is not None and len(boards) < count:
+                boards.append(board)
+    return boards, attempts
+
+
+class BoardCache:
+    """
+    On-disk store of no-guess boards, indexed by (height, width, mines).
+
+    Each board size has one file of fixed size records, each a bit-packed mine mask, so
+    boards are added by appending and taken by truncating the last record. Every process
+    sharing the cache holds a lock file next to the file while it adds or takes boards, so
+    no board is taken twice and no append is lost to a truncation.
+    """
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    def path(self, height, width, mines):
+        """
+        Return the path of the file holding boards of the given size.
+        """
+        return os.path.join(self.directory, f"{height}x{width}x{mines}.bin")
+
+    def _record_size(self, height, width):
+        return (height * width + 7) // 8
+
+    @contextmanager
+    def _locked(self, height, width, mines):
+        """
+        Hold the lock of the file holding boards of the given size, waiting for any other
+        process holding it.
+        """
+        lock = self.path(height, width, mines) + ".lock"
+        while True:
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock) > LOCK_TIMEOUT:
+                        os.remove(lock)
+                except OSError:
+                    pass
+                time.sleep(0.001)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(lock)
+
+    def count(self, height, width, mines):
+        """
+        Return the number of boards of the given size in the cache.
+        """
+        try:
+            return os.path.getsize(self.path(height, width, mines)) // self._record_size(height, width)
+        except OSError:
+            return 0
+
+    def add(self, height, width, mines, boards):
+        """
+        Append the given mine masks to the cache.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        data = b"".join(np.packbits(np.asarray(board, dtype=bool).ravel()).tobytes() for board in boards)
+        with self._locked(height, width, mines), open(self.path(height, width, mines), "ab") as f:
+            f.write(data)
+        return
+
+    def take(self, height, width, mines):
+        """
+        Remove a board of the given size from the cache and return its mine mask, or None if
+        there are none.
+        """
+        size = self._record_size(height, width)
+        path = self.path(height, width, mines)
+        if not os.path.exists(path):
+            return None
+        try:
+            with self._locked(height, width, mines), open(path, "r+b") as f:
+                end = f.seek(0, os.SEEK_END) // size * size
+                if not end:
+                    return None
+                f.seek(end - size)
+                record = f.read(size)
+                f.truncate(end - size)
+        except OSError:
+            return None
+        bits = np.unpackbits(np.frombuffer(record, dtype=np.uint8), count=height * width)
+        return bits.astype(bool).reshape((height, width))
+
+
+def new_game(height, width, mines, difficulty=None, cache=None):
+    """
+    Start a game on a no-guess board from the cache, with its first click already made.
+
+    Returns None if the cache has no boards of the given size.
+    """
+    board = (cache or BoardCache()).take(height, width, mines)
+    if board is None:
+        return None
+    game = Game(height, width, mines, difficulty, board=board)
+    game.reveal(first_click(height, width))
+    return game
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add no-guess boards to the board cache.")
+    parser.add_argument("boards", nargs="*", type=parse_board, metavar="BOARD",
+                        help="difficulty name or HEIGHTxWIDTHxMINES size (default: every difficulty)")
+    parser.add_argument("-n", "--count", type=int, default=100, help="boards to add for each size")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the first candidate (default: random)")
+    parser.add_argument("--cache", default=CACHE_DIR, help=f"cache directory (default: {CACHE_DIR})")
+    args = parser.parse_args(argv)
+
+    cache = BoardCache(args.cache)
+    seed = args.seed if args.seed is not None else int.from_bytes(os.urandom(4), "little")
+    boards = args.boards or [parse_board(name) for name in DIFFICULTIES]
+    with Pool(args.workers) as pool:
+        for name, height, width, mines in boards:
+            # Each size gets its own seed, so that no two sizes deal from the same streams.
+            sized = int(np.random.SeedSequence([seed, height, width, mines]).generate_state(1)[0])
+            found, attempts = generate(height, width, mines, args.count, pool, sized)
+            cache.add(height, width, mines, found)
+            print(f"{name}: added {len(found)} boards from {attempts} candidates, "
+                  f"{cache.count(height, width, mines)} in cache")
+    return
+
+
+if __name__ == "__main__":
+    main()
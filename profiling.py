@@ -0,0 +1,194 @@
+"""
+Optional instrumentation of the hot paths of the Minesweeper engine, solver and UI.
+
+While enabled, every hooked function is replaced by a wrapper which counts its calls and
+records how long each took and how many tiles it touched. When disabled the original
+functions are put back, so instrumentation costs nothing at all unless it is in use. The
+engine and solver hooks are built in, and the UI adds its own with hook().
+
+Usage:
+    python profiling.py [-n GAMES] [--seed SEED] [--json FILE] [BOARD ...]
+
+plays the given number of games on each board with the solver, guessing when it must,
+and prints the statistics of every hook, optionally saving them as JSON.
+
+Created by Daniel Fay
+"""
+
+
+import argparse
+import json
+from collections import deque
+from functools import wraps
+from time import perf_counter
+
+import numpy as np
+
+import engine
+import solver
+
+# Latencies kept for each hook to compute percentiles from, the most recent first to go.
+SAMPLES = 100_000
+
+
+def _length(args, result):
+    return len(result)
+
+# Functions to instrument, as (owner, attribute, name, tiles), where tiles returns the number
+# of tiles touched by a call from its arguments and result, or is None.
+HOOKS = [
+    (engine, "create_board", "engine.create_board", lambda args, result: result[0].size),
+    (engine.Game, "reveal", "engine.reveal", _length),
+    (engine.Game, "flood_fill", "engine.flood_fill", _length),
+    (engine.Game, "check_win", "engine.check_win", None),
+    (solver, "constraint", "solver.constraint", lambda args, result: len(result[0])),
+    (solver.Solver, "deduce", "solver.deduce", lambda args, result: len(result[0]) + len(result[1])),
+    (solver.Solver, "_single", "solver.single_rule", lambda args, result: len(args[1]) if result else 0),
+    (solver.Solver, "_compare", "solver.subset_rule", lambda args, result: len(args[2])),
+    (solver.Solver, "decide", "solver.decide", lambda args, result: len(result[0]) + len(result[1])),
+    (solver, "mine_weights", "solver.mine_weights", lambda args, result: len(result[0]) + len(result[1])),
+]
+
+# Statistics of each hook by name, and the original functions of the installed hooks.
+stats = {}
+_originals = []
+
+
+class Stat:
+    """
+    Call count, latencies and tiles touched of one hooked function.
+    """
+    __slots__ = ("calls", "total", "tiles", "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.tiles = 0
+        self.samples = deque(maxlen=SAMPLES)
+
+    def summary(self):
+        """
+        Return the statistics as a dict, with times in microseconds.
+        """
+        p50, p90, p99 = np.percentile(self.samples, [50, 90, 99]) * 1e6 if self.samples else (0, 0, 0)
+        return {
+            "calls": self.calls,
+            "total_ms": 1000 * self.total,
+            "mean_us": 1e6 * self.total / self.calls if self.calls else 0,
+            "p50_us": float(p50),
+            "p90_us": float(p90),
+            "p99_us": float(p99),
+            "max_us": 1e6 * max(self.samples, default=0),
+            "tiles": self.tiles,
+            "tiles_per_call": self.tiles / self.calls if self.calls else 0,
+        }
+
+
+def hook(owner, attr, name, tiles=None):
+    """
+    Add a function to instrument, which is installed on the next call to enable.
+    """
+    HOOKS.append((owner, attr, name, tiles))
+    return
+
+def _timed(fn, stat, tiles):
+    """
+    Return a wrapper of fn recording each call in stat.
+    """
+    @wraps(fn)
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = perf_counter() - start
+        stat.calls += 1
+        stat.total += elapsed
+        stat.samples.append(elapsed)
+        if tiles is not None:
+            stat.tiles += tiles(args, result)
+        return result
+    return timed
+
+def enabled():
+    """
+    Return whether the hooks are installed.
+    """
+    return bool(_originals)
+
+def enable():
+    """
+    Install every hook, keeping any statistics already collected.
+    """
+    if _originals:
+        return
+    for owner, attr, name, tiles in HOOKS:
+        fn = owner.__dict__[attr] if isinstance(owner, type) else getattr(owner, attr)
+        _originals.append((owner, attr, fn))
+        setattr(owner, attr, _timed(fn, stats.setdefault(name, Stat()), tiles))
+    return
+
+def disable():
+    """
+    Put back the original functions of every hook.
+    """
+    while _originals:
+        owner, attr, fn = _originals.pop()
+        setattr(owner, attr, fn)
+    return
+
+def reset():
+    """
+    Discard all statistics collected so far.
+    """
+    for stat in stats.values():
+        stat.__init__()
+    return
+
+def snapshot():
+    """
+    Return the statistics of every hook called so far, by name.
+    """
+    return {name: stat.summary() for name, stat in stats.items() if stat.calls}
+
+def export(path):
+    """
+    Write the statistics of every hook called so far to a JSON file.
+    """
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2, sort_keys=True)
+    return
+
+def report():
+    """
+    Return the statistics of every hook called so far as lines of a table.
+    """
+    lines = [f"{'hook':22} {'calls':>8} {'total ms':>10} {'p50 us':>9} {'p99 us':>9} {'tiles/call':>10}"]
+    for name, s in sorted(snapshot().items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(f"{name:22} {s['calls']:8} {s['total_ms']:10.2f} {s['p50_us']:9.1f} "
+                     f"{s['p99_us']:9.1f} {s['tiles_per_call']:10.1f}")
+    return lines
+
+def main(argv=None):
+    from simulate import parse_board
+
+    parser = argparse.ArgumentParser(description="Profile the Minesweeper engine and solver in play.")
+    parser.add_argument("boards", nargs="*", type=parse_board, metavar="BOARD",
+                        help="difficulty name or HEIGHTxWIDTHxMINES size (default: expert)")
+    parser.add_argument("-n", "--games", type=int, default=100, help="games to play on each board")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game on each board")
+    parser.add_argument("--json", help="write the statistics to this JSON file")
+    args = parser.parse_args(argv)
+
+    enable()
+    for name, height, width, mines in args.boards or [parse_board("expert")]:
+        for n in range(args.games):
+            solver.Solver(engine.Game(height, width, mines, seed=args.seed + n)).solve(guess=True)
+    disable()
+
+    print("\n".join(report()))
+    if args.json:
+        export(args.json)
+    return
+
+
+if __name__ == "__main__":
+    main()
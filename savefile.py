@@ -0,0 +1,171 @@
+"""
+Compact binary save files for games of Minesweeper.
+
+A save file is a fixed 64 byte header followed by four bit-packed planes of one bit per
+tile, row by row: the mines, then the revealed, flagged and question marked tiles. Every
+field is at a fixed offset, so a file is read by memory-mapping it rather than parsing it,
+and open_save gives the planes of even a very large board without reading them all in.
+
+Usage:
+    python savefile.py FILE ...
+
+prints the header of each save file.
+
+Created by Daniel Fay
+"""
+
+
+import sys
+
+import numpy as np
+
+from engine import Game, FLAG, MINE, QUESTION, REVEALED
+
+MAGIC = b"MSWP"
+VERSION = 1
+
+# Layout of the header. exploded is -1 if no mine was revealed by the player, and seed is
+# only set if the SEEDED flag is.
+HEADER = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u2"),
+    ("flags", "<u2"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("mines", "<u4"),
+    ("elapsed", "<f8"),
+    ("exploded", "<i8"),
+    ("seed", "<u8"),
+    ("difficulty", "S20"),
+])
+
+# Bits of the flags field of the header.
+GAMEOVER = 1
+WON = 2
+SEEDED = 4
+
+# State bit stored in each plane, in the order the planes are written.
+PLANES = {
+    "mines": MINE,
+    "revealed": REVEALED,
+    "flagged": FLAG,
+    "questioned": QUESTION,
+}
+
+
+def plane_size(height, width):
+    """
+    Return the size in bytes of one bit-packed plane of a board.
+    """
+    return (height * width + 7) // 8
+
+def encode(game, elapsed=0):
+    """
+    Return the save file of the game, and the seconds elapsed in it, as bytes.
+    """
+    header = np.zeros((), dtype=HEADER)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["flags"] = (GAMEOVER if game.gameover else 0) | (WON if game.won else 0) | \
+                      (SEEDED if game.seed is not None else 0)
+    header["height"] = game.height
+    header["width"] = game.width
+    header["mines"] = game.mines
+    header["elapsed"] = elapsed
+    header["exploded"] = -1 if game.exploded is None else game.exploded
+    header["seed"] = game.seed or 0
+    header["difficulty"] = (game.difficulty or "").encode()
+
+    planes = [np.packbits((game.state & bit) != 0).tobytes() for bit in PLANES.values()]
+    return header.tobytes() + b"".join(planes)
+
+def save_game(game, path, elapsed=0):
+    """
+    Write the game, and the seconds elapsed in it, to a save file at path.
+    """
+    with open(path, "wb") as f:
+        f.write(encode(game, elapsed))
+    return
+
+def parse(data, name="data"):
+    """
+    Split data, a uint8 array holding a save file, into its header, as a numpy record, and
+    a dict of its bit-packed planes by name. Both are views of data.
+    """
+    if len(data) < HEADER.itemsize:
+        raise ValueError(f"{name} is not a save file")
+    header = data[:HEADER.itemsize].view(HEADER)[0]
+    if header["magic"] != MAGIC or header["version"] != VERSION:
+        raise ValueError(f"{name} is not a version {VERSION} save file")
+
+    size = plane_size(int(header["height"]), int(header["width"]))
+    if len(data) != HEADER.itemsize + len(PLANES) * size:
+        raise ValueError(f"{name} is truncated")
+    planes = {}
+    for n, plane in enumerate(PLANES):
+        start = HEADER.itemsize + n * size
+        planes[plane] = data[start:start + size]
+    return header, planes
+
+def open_save(path):
+    """
+    Memory-map the save file at path and return its header and planes, as parse.
+
+    The planes are views of the file, which is only read from disk as they are used.
+    """
+    return parse(np.memmap(path, dtype=np.uint8, mode="r"), path)
+
+def unpack(plane, height, width):
+    """
+    Return a bit-packed plane as a boolean mask of the given shape.
+    """
+    return np.unpackbits(plane, count=height * width).astype(bool).reshape((height, width))
+
+def load_game(path):
+    """
+    Load a game from the save file at path.
+
+    Returns the game, ready to be played on from where it was saved, and the seconds
+    elapsed in it.
+    """
+    return _build(*open_save(path))
+
+def decode(data):
+    """
+    Load a game from a save file held in data, a bytes-like object, as load_game.
+    """
+    return _build(*parse(np.frombuffer(data, dtype=np.uint8)))
+
+def _build(header, planes):
+    """
+    Return the game held by a parsed save file and the seconds elapsed in it.
+    """
+    height, width = int(header["height"]), int(header["width"])
+    flags = int(header["flags"])
+
+    state = np.zeros(height * width, dtype=np.uint8)
+    for name, bit in PLANES.items():
+        state |= np.unpackbits(planes[name], count=height * width) * np.uint8(bit)
+
+    game = Game(height, width, int(header["mines"]), header["difficulty"].decode() or None,
+                board=state & MINE)
+    exploded = int(header["exploded"])
+    game.restore(state, bool(flags & GAMEOVER), bool(flags & WON), None if exploded < 0 else exploded)
+    if flags & SEEDED:
+        game.seed = int(header["seed"])
+    return game, float(header["elapsed"])
+
+def main(argv=None):
+    for path in (sys.argv[1:] if argv is None else argv):
+        header, planes = open_save(path)
+        flags = int(header["flags"])
+        status = "won" if flags & WON else "lost" if flags & GAMEOVER else "in play"
+        seed = f", seed {int(header['seed'])}" if flags & SEEDED else ""
+        print(f"{path}: {int(header['height'])}x{int(header['width'])}x{int(header['mines'])} "
+              f"{header['difficulty'].decode() or 'custom'}, {status}, "
+              f"{float(header['elapsed']):.0f}s{seed}")
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+High score store for Minesweeper, backed by SQLite.
+
+Scores are kept in one table with an index on (height, width, mines, seconds), so every
+board size, whether a difficulty or a custom size, has its own leaderboard and a top-k
+query reads only the k rows it returns. Each score is added in its own transaction and the
+database is in write-ahead log mode, so a crash never leaves a half written score and any
+number of game processes can record scores at once without rewriting the store. The 3BV of
+the board is kept with each score, so the leaderboards also show the 3BV per second.
+
+Usage:
+    python scores.py [-k K] [--import FILE] [BOARD ...]
+
+prints the top K scores of each board, written as a difficulty name or HEIGHTxWIDTHxMINES,
+after adding the expert scores of a high score file in the old name,seconds text format.
+
+Created by Daniel Fay
+"""
+
+
+import argparse
+import os
+import sqlite3
+import time
+
+from engine import DIFFICULTIES
+
+# Default location of the score database, next to this file.
+SCORES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "high_scores.db")
+
+# Number of scores shown on each leaderboard.
+LEADERBOARD_SIZE = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    height INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    mines INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    seconds INTEGER NOT NULL,
+    recorded REAL NOT NULL,
+    bbbv INTEGER
+);
+CREATE INDEX IF NOT EXISTS scores_by_board ON scores (height, width, mines, seconds, id);
+"""
+
+
+def board_name(height, width, mines):
+    """
+    Return the difficulty name of a board size, or HEIGHTxWIDTHxMINES for a custom size.
+    """
+    for name, size in DIFFICULTIES.items():
+        if size == (height, width, mines):
+            return name
+    return f"{height}x{width}x{mines}"
+
+
+def bbbv_rate(bbbv, seconds):
+    """
+    Return the 3BV per second of a score as text, or "-" if its 3BV is not known.
+    """
+    return "-" if bbbv is None else f"{bbbv / max(seconds, 1):.2f} 3BV/s"
+
+
+class ScoreStore:
+    """
+    Leaderboards of the fastest winning times for each board size.
+
+    Ties are ranked by which score was recorded first.
+    """
+    def __init__(self, path=SCORES_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        columns = [column[1] for column in self._db.execute("PRAGMA table_info(scores)")]
+        if "bbbv" not in columns:
+            # Stores made before the 3BV was kept, whose scores have none.
+            with self._db:
+                self._db.execute("ALTER TABLE scores ADD COLUMN bbbv INTEGER")
+
+    def add(self, height, width, mines, name, seconds, bbbv=None):
+        """
+        Record a winning time on a board of the given size, with the 3BV of the board if
+        known, and return its rank, from 1.
+        """
+        with self._db:
+            row = self._db.execute("INSERT INTO scores (height, width, mines, name, seconds, recorded, bbbv) "
+                                   "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   (height, width, mines, name, seconds, time.time(), bbbv)).lastrowid
+        ahead, = self._db.execute("SELECT COUNT(*) FROM scores WHERE height = ? AND width = ? AND mines = ? "
+                                  "AND (seconds < ? OR (seconds = ? AND id < ?))",
+                                  (height, width, mines, seconds, seconds, row)).fetchone()
+        return ahead + 1
+
+    def top(self, height, width, mines, k=LEADERBOARD_SIZE):
+        """
+        Return the k fastest scores on a board of the given size, as (name, seconds, bbbv)
+        tuples. bbbv is None for a score recorded without it.
+        """
+        return self._db.execute("SELECT name, seconds, bbbv FROM scores WHERE height = ? AND width = ? "
+                                "AND mines = ? ORDER BY seconds, id LIMIT ?",
+                                (height, width, mines, k)).fetchall()
+
+    def rank(self, height, width, mines, seconds):
+        """
+        Return the rank, from 1, a winning time on a board of the given size would have if it
+        were recorded now.
+        """
+        ahead, = self._db.execute("SELECT COUNT(*) FROM scores WHERE height = ? AND width = ? "
+                                  "AND mines = ? AND seconds <= ?",
+                                  (height, width, mines, seconds)).fetchone()
+        return ahead + 1
+
+    def qualifies(self, height, width, mines, seconds, k=LEADERBOARD_SIZE):
+        """
+        Return whether a winning time would make the top k scores of its board size.
+        """
+        return self.rank(height, width, mines, seconds) <= k
+
+    def boards(self):
+        """
+        Return the sizes of every board with a score, as (height, width, mines).
+        """
+        return self._db.execute("SELECT DISTINCT height, width, mines FROM scores "
+                                "ORDER BY height, width, mines").fetchall()
+
+    def import_text(self, path, height, width, mines):
+        """
+        Add the scores of a text file of name,seconds lines to the leaderboard of the given
+        board size. Returns the number of scores added.
+        """
+        with open(path) as f:
+            rows = [line.rsplit(",", 1) for line in f if line.strip()]
+        now = time.time()
+        with self._db:
+            self._db.executemany("INSERT INTO scores (height, width, mines, name, seconds, recorded) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(height, width, mines, name, int(seconds), now) for name, seconds in rows])
+        return len(rows)
+
+    def close(self):
+        self._db.close()
+        return
+
+
+def main(argv=None):
+    from simulate import parse_board
+
+    parser = argparse.ArgumentParser(description="Show the Minesweeper leaderboards.")
+    parser.add_argument("boards", nargs="*", type=parse_board, metavar="BOARD",
+                        help="difficulty name or HEIGHTxWIDTHxMINES size (default: every board with a score)")
+    parser.add_argument("-k", type=int, default=LEADERBOARD_SIZE, help="scores to show for each board")
+    parser.add_argument("--import", dest="legacy", metavar="FILE",
+                        help="first add the expert scores of an old name,seconds high score file")
+    parser.add_argument("--db", default=SCORES_PATH, help=f"score database (default: {SCORES_PATH})")
+    args = parser.parse_args(argv)
+
+    store = ScoreStore(args.db)
+    if args.legacy:
+        print(f"imported {store.import_text(args.legacy, *DIFFICULTIES['expert'])} scores")
+    boards = [size for name, *size in args.boards] or store.boards()
+    for height, width, mines in boards:
+        print(f"{board_name(height, width, mines)}:")
+        for rank, (name, seconds, bbbv) in enumerate(store.top(height, width, mines, args.k), 1):
+            print(f"  {rank:3}. {name:20} {seconds // 60}:{seconds % 60:02d}  {bbbv_rate(bbbv, seconds)}")
+    store.close()
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Headless simulation runner for Minesweeper.
+
+Plays complete games with the automated solver, guessing the tile least likely to be a mine
+whenever nothing can be deduced, and reports win rate, guesses, throughput and time spent in
+each phase of play. Games are spread across a process pool and each one is seeded from its
+number, so runs are reproducible for any number of workers.
+
+Usage:
+    python simulate.py [-n GAMES] [-w WORKERS] [--seed SEED] [BOARD ...]
+
+where each BOARD is a difficulty name or a custom size written HEIGHTxWIDTHxMINES.
+
+Created by Daniel Fay
+"""
+
+
+import argparse
+import os
+from multiprocessing import Pool
+from time import perf_counter
+
+from engine import Game, DIFFICULTIES
+from solver import Solver
+
+# Phases of play which are timed separately.
+PHASES = ["generate", "deduce", "resolve"]
+
+
+def parse_board(text):
+    """
+    Return (name, height, width, mines) for a difficulty name or a HEIGHTxWIDTHxMINES size.
+    """
+    if text in DIFFICULTIES:
+        return (text,) + DIFFICULTIES[text]
+    try:
+        height, width, mines = map(int, text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not a difficulty or HEIGHTxWIDTHxMINES size")
+    if not 0 <= mines <= height * width:
+        raise argparse.ArgumentTypeError(f"{text!r} has more mines than tiles")
+    return text, height, width, mines
+
+def play(args):
+    """
+    Play one seeded game to the end with the solver.
+
+    Returns whether the game was won, the number of guesses made and the seconds spent in
+    each phase of play.
+    """
+    height, width, mines, seed = args
+    times = dict.fromkeys(PHASES, 0.0)
+
+    start = perf_counter()
+    game = Game(height, width, mines, seed=seed)
+    solver = Solver(game)
+    times["generate"] = perf_counter() - start
+
+    while not game.gameover:
+        start = perf_counter()
+        changed = solver.step()
+        times["deduce"] += perf_counter() - start
+        if changed:
+            continue
+
+        start = perf_counter()
+        changed = solver.resolve(guess=True)
+        times["resolve"] += perf_counter() - start
+        if not changed:
+            break
+
+    return game.won, solver.guesses, times
+
+def simulate(height, width, mines, games, pool, seed=0):
+    """
+    Play the given number of games on the pool and return a summary of the results.
+    """
+    start = perf_counter()
+    tasks = [(height, width, mines, seed + n) for n in range(games)]
+    results = pool.map(play, tasks, chunksize=max(1, games // (4 * (os.cpu_count() or 1))))
+    elapsed = perf_counter() - start
+
+    return {
+        "games": games,
+        "win_rate": sum(won for won, guesses, times in results) / games,
+        "guesses": sum(guesses for won, guesses, times in results) / games,
+        "games_per_second": games / elapsed,
+        "phase_ms": {phase: 1000 * sum(times[phase] for won, guesses, times in results) / games
+                     for phase in PHASES},
+    }
+
+def report(name, summary):
+    """
+    Print the summary of a simulation run.
+    """
+    phases = ", ".join(f"{phase} {ms:.3f}" for phase, ms in summary["phase_ms"].items())
+    print(f"{name}: {summary['games']} games, win rate {summary['win_rate']:.1%}, "
+          f"{summary['guesses']:.2f} guesses/game, {summary['games_per_second']:.1f} games/s")
+    print(f"    ms/game: {phases}")
+    return
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Minesweeper games with the solver and report the results.")
+    parser.add_argument("boards", nargs="*", type=parse_board, metavar="BOARD",
+                        help="difficulty name or HEIGHTxWIDTHxMINES size (default: every difficulty)")
+    parser.add_argument("-n", "--games", type=int, default=1000, help="games to play on each board")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game on each board")
+    args = parser.parse_args(argv)
+
+    boards = args.boards or [parse_board(name) for name in DIFFICULTIES]
+    with Pool(args.workers) as pool:
+        for name, height, width, mines in boards:
+            report(name, simulate(height, width, mines, args.games, pool, args.seed))
+    return
+
+
+if __name__ == "__main__":
+    main()
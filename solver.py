@@ -0,0 +1,605 @@
+"""
+Automated solver for Minesweeper, playing directly against the headless game engine.
+
+Created by Daniel Fay
+"""
+
+
+import numpy as np
+from collections import deque
+from math import comb
+from operator import mul
+
+from engine import FLAG, REVEALED
+
+
+def constraint(game, i):
+    """
+    Return the constraint given by the revealed tile i, as the frozenset of its covered,
+    unflagged neighbors and the number of mines among them.
+    """
+    state = game.raw_state
+    unknown = []
+    mines = game.raw_counts[i]
+    for nbr in game.nbrs[i]:
+        if state[nbr] & FLAG:
+            mines -= 1
+        elif not state[nbr] & REVEALED:
+            unknown.append(nbr)
+    return frozenset(unknown), mines
+
+
+def _components(constraints):
+    """
+    Split the constraints into groups which share no tiles.
+
+    Returns a list of (cells, constraints) pairs, with the cells of each group ordered so
+    that tiles under the same constraints are close together.
+    """
+    by_cell = {}
+    for cid, (cells, n) in enumerate(constraints):
+        for cell in cells:
+            by_cell.setdefault(cell, []).append(cid)
+
+    components = []
+    seen = set()
+    for start in range(len(constraints)):
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = deque([start])
+        order, members, placed = [], [], set()
+        while queue:
+            cid = queue.popleft()
+            members.append(constraints[cid])
+            for cell in sorted(constraints[cid][0]):
+                if cell not in placed:
+                    placed.add(cell)
+                    order.append(cell)
+                for other in by_cell[cell]:
+                    if other not in seen:
+                        seen.add(other)
+                        queue.append(other)
+        components.append((order, members))
+    return components
+
+def _add_shifted(acc, poly, shift):
+    """
+    Add poly, multiplied by x^shift, into acc. Polynomials are lists of coefficients.
+    """
+    for k, x in enumerate(poly):
+        if x:
+            acc[k + shift] += x
+    return acc
+
+def _count_component(cells, constraints):
+    """
+    Count the mine assignments to the cells of one component which satisfy its constraints.
+
+    Cells are assigned in order, and the partial assignments are memoized by the number of
+    mines still needed by each constraint which has been started but not finished. A forward
+    and a backward pass over these states gives, as lists indexed by the number of mines k in
+    the component, the number of valid assignments with k mines and, for each cell, the
+    number of those in which the cell is a mine.
+    """
+    size = len(cells)
+    pos = {cell: t for t, cell in enumerate(cells)}
+    members = [[] for _ in cells]
+    for cid, (cs, n) in enumerate(constraints):
+        for cell in cs:
+            members[pos[cell]].append(cid)
+
+    # For each cell, the number of cells of each of its constraints which come after it.
+    left = [{} for _ in cells]
+    for cid, (cs, n) in enumerate(constraints):
+        ts = sorted(pos[cell] for cell in cs)
+        for k, t in enumerate(ts):
+            left[t][cid] = len(ts) - k - 1
+
+    def transitions(t, state):
+        needed = dict(state)
+        for cid in members[t]:
+            needed.setdefault(cid, constraints[cid][1])
+        result = []
+        for v in (0, 1):
+            after = dict(needed)
+            for cid in members[t]:
+                after[cid] -= v
+                if not 0 <= after[cid] <= left[t][cid]:
+                    break
+                if not left[t][cid]:
+                    del after[cid]
+            else:
+                result.append((v, tuple(sorted(after.items()))))
+        return result
+
+    forward = [{(): [1] + [0] * size}]
+    steps = []
+    for t in range(size):
+        layer, step = {}, {}
+        for state, poly in forward[t].items():
+            step[state] = transitions(t, state)
+            for v, after in step[state]:
+                _add_shifted(layer.setdefault(after, [0] * (size + 1)), poly, v)
+        forward.append(layer)
+        steps.append(step)
+
+    backward = {(): [1] + [0] * size}
+    marginals = [None] * size
+    for t in reversed(range(size)):
+        layer = {}
+        mine = [0] * (size + 1)
+        for state, poly in forward[t].items():
+            acc = layer.setdefault(state, [0] * (size + 1))
+            for v, after in steps[t][state]:
+                if after not in backward:
+                    continue
+                _add_shifted(acc, backward[after], v)
+                if v:
+                    # Assignments through this state which make cell t a mine.
+                    for k, x in enumerate(poly):
+                        if x:
+                            _add_shifted(mine, [x * y for y in backward[after][:size - k]], k + 1)
+        backward = layer
+        marginals[t] = mine
+
+    return backward.get((), [0] * (size + 1)), marginals
+
+def _convolve(a, b):
+    """
+    Return the product of the polynomials a and b.
+    """
+    result = [0] * (len(a) + len(b) - 1)
+    for k, x in enumerate(a):
+        if x:
+            _add_shifted(result, [x * y for y in b], k)
+    return result
+
+def _binomials(n, top, count):
+    """
+    Return the list of comb(n, top - s) for s in range(count), 0 where top - s is out of
+    range, working each out from the one before instead of from scratch.
+    """
+    values = [0] * count
+    s = max(0, top - n)
+    if s < count and top - s >= 0:
+        value = comb(n, top - s)
+        values[s] = value
+        for s in range(s + 1, min(count, top + 1)):
+            k = top - s + 1
+            value = value * k // (n - k + 1)
+            values[s] = value
+    return values
+
+def mine_weights(game):
+    """
+    Count the arrangements of the remaining mines consistent with everything revealed.
+
+    The covered, unflagged tiles next to revealed numbers are split into independent
+    components whose assignments are counted exactly, and these are combined under the total
+    mine count with binomial weights for the covered tiles away from the numbers.
+
+    Returns a dict mapping each tile next to a number to the number of arrangements in which
+    it is a mine, the list of the other covered tiles, the number of arrangements in which
+    any one of those is a mine, and the total number of arrangements.
+    """
+    constraints = set()
+    for i in np.flatnonzero(game.revealed & (game.counts > 0)).tolist():
+        cells, n = constraint(game, i)
+        if cells:
+            constraints.add((cells, n))
+    return _weigh(game, constraints, {})
+
+def _weigh(game, constraints, counted):
+    """
+    Work out mine_weights of the game from the set of its (cells, n) constraints.
+
+    counted maps components, as (cells, constraints) pairs of tuples, to their counts from
+    _count_component. Those found in it are not counted again, and it is left holding the
+    components of this board only.
+    """
+    components = _components(sorted(constraints, key=lambda c: min(c[0])))
+
+    frontier = set()
+    for cells, members in components:
+        frontier.update(cells)
+    interior = [i for i in np.flatnonzero(~game.revealed & ~game.flagged).tolist() if i not in frontier]
+    remaining = game.mines - game.flags
+
+    found = {}
+    for cells, members in components:
+        key = (tuple(cells), tuple(members))
+        found[key] = counted[key] if key in counted else _count_component(cells, members)
+    counted.clear()
+    counted.update(found)
+    counted = list(found.values())
+
+    # Mine count distributions of all components but one, built from prefix and suffix products.
+    prefix = [[1]]
+    for total, marginals in counted:
+        prefix.append(_convolve(prefix[-1], total))
+    suffix = [[1]]
+    for total, marginals in reversed(counted):
+        suffix.append(_convolve(suffix[-1], total))
+    suffix.reverse()
+
+    # Ways to place the mines not in the components among the interior tiles, and among all
+    # but one of them, by the number of mines in the components.
+    everything = prefix[-1]
+    ways = _binomials(len(interior), remaining, len(everything))
+    ways_but_one = _binomials(len(interior) - 1, remaining - 1, len(everything))
+    total = sum(x * y for x, y in zip(everything, ways))
+    interior_weight = sum(x * y for x, y in zip(everything, ways_but_one))
+
+    weights = {}
+    for c, ((cells, members), (comp_total, marginals)) in enumerate(zip(components, counted)):
+        others = _convolve(prefix[c], suffix[c + 1])
+        # Weight of each number of mines in this component, over every arrangement elsewhere.
+        # Only the numbers of mines the other components can hold are summed over.
+        low = next((j for j, x in enumerate(others) if x), len(others))
+        others = others[low:]
+        outside = [sum(map(mul, others, ways[k + low:])) for k in range(len(cells) + 1)]
+        for cell, mine in zip(cells, marginals):
+            weights[cell] = sum(x * outside[k] for k, x in enumerate(mine))
+
+    return weights, interior, interior_weight, total
+
+def mine_probabilities(game):
+    """
+    Return the exact probability that each tile of the game is a mine, given everything
+    revealed and assuming every flag is correct.
+
+    Revealed and flagged tiles are nan, as is every tile if the board is inconsistent.
+    """
+    probs = np.full(game.size, np.nan)
+    weights, interior, interior_weight, total = mine_weights(game)
+    if total:
+        for cell, weight in weights.items():
+            probs[cell] = weight / total
+        probs[interior] = interior_weight / total
+    return probs
+
+
+class MineWeights:
+    """
+    The mine_weights of a game, kept up to date move by move.
+
+    The constraint of every revealed number is kept, and after a move only those of the
+    numbers next to the changed tiles are looked up again. The counts of each component are
+    kept too, so only the components whose constraints changed are counted again.
+    """
+    def __init__(self, game):
+        self.game = game
+        self._constraints = {}
+        self._counted = {}
+        self._stale = set(np.flatnonzero(game.revealed & (game.counts > 0)).tolist())
+
+    def update(self, changed):
+        """
+        Note that the tiles in changed have been revealed or marked.
+        """
+        nbrs = self.game.nbrs
+        for i in changed:
+            self._stale.add(i)
+            self._stale.update(nbrs[i])
+        return
+
+    def get(self):
+        """
+        Return the mine_weights of the game as it is now.
+        """
+        game = self.game
+        state, counts = game.raw_state, game.raw_counts
+        for i in self._stale:
+            cells, n = constraint(game, i) if state[i] & REVEALED and counts[i] else ((), 0)
+            if cells:
+                self._constraints[i] = (cells, n)
+            else:
+                self._constraints.pop(i, None)
+        self._stale.clear()
+        return _weigh(game, set(self._constraints.values()), self._counted)
+
+
+class Solver:
+    """
+    Incremental constraint propagation solver for a single game.
+
+    Every revealed number gives a constraint: the set of its covered, unflagged neighbors
+    holds exactly its number of mines less the flags around it. Constraints are only
+    re-examined when a tile they touch changes, by way of a work queue of revealed tiles,
+    and each one is checked with the single tile rule and against the constraints which
+    overlap it with the subset/difference rule.
+
+    Flags are assumed to be correct, as they are whenever they were placed by the solver.
+    contradicted is set once a number is found which the flags around it contradict.
+    """
+    def __init__(self, game):
+        """
+        Create a solver for the given game and queue every constraint already on the board.
+        """
+        self.game = game
+        self.guesses = 0
+        self.contradicted = False
+        self._queue = deque()
+        self._queued = set()
+        for i in np.flatnonzero(game.revealed & (game.counts > 0)).tolist():
+            self._push(i)
+
+    def update(self, changed):
+        """
+        Queue the constraints touched by the tiles in changed, which have been revealed or
+        had a flag added or removed.
+        """
+        state, counts, nbrs = self.game.raw_state, self.game.raw_counts, self.game.nbrs
+        for i in changed:
+            if state[i] & REVEALED and counts[i]:
+                self._push(i)
+            for nbr in nbrs[i]:
+                if state[nbr] & REVEALED and counts[nbr]:
+                    self._push(nbr)
+        return
+
+    def _push(self, i):
+        if i not in self._queued:
+            self._queued.add(i)
+            self._queue.append(i)
+
+    def deduce(self):
+        """
+        Examine every queued constraint, returning the sets of tiles found to be safe and
+        found to be mines.
+        """
+        game = self.game
+        safe, mines = set(), set()
+
+        while self._queue:
+            i = self._queue.popleft()
+            self._queued.discard(i)
+
+            cells, n = constraint(game, i)
+            if not 0 <= n <= len(cells):
+                # More flags around the number than it allows, or too few covered tiles left
+                # for its mines, so some flag is wrong.
+                self.contradicted = True
+            elif cells and not self._single(cells, n, safe, mines):
+                self._compare(i, cells, n, safe, mines)
+
+        return safe, mines
+
+    def _single(self, cells, n, safe, mines):
+        """
+        Single tile rule, adding the tiles of a constraint to safe or to mines if the
+        constraint alone decides all of them. Returns whether it did.
+        """
+        if n == 0:
+            safe |= cells
+            return True
+        if n == len(cells):
+            mines |= cells
+            return True
+        return False
+
+    def _compare(self, i, cells, n, safe, mines):
+        """
+        Subset/difference rule, comparing the constraint of tile i against every constraint
+        sharing a tile with it and adding the tiles decided to safe and mines.
+        """
+        game = self.game
+        state, counts, nbrs = game.raw_state, game.raw_counts, game.nbrs
+        seen = {i}
+        for cell in cells:
+            for j in nbrs[cell]:
+                if j in seen or not state[j] & REVEALED or not counts[j]:
+                    continue
+                seen.add(j)
+
+                other, m = constraint(game, j)
+                only_here, only_there = cells - other, other - cells
+                if m - n == len(only_there):
+                    mines |= only_there
+                    safe |= only_here
+                elif n - m == len(only_here):
+                    mines |= only_here
+                    safe |= only_there
+        return
+
+    def step(self):
+        """
+        Apply one round of deductions to the game.
+
+        Returns the tiles changed, which is empty once nothing more can be deduced.
+        """
+        return self._apply(*self.deduce())
+
+    def resolve(self, guess=False):
+        """
+        Fall back on exact mine probabilities once no local deduction is left, playing the
+        tiles chosen by decide. Returns the tiles changed.
+        """
+        return self._apply(*self.decide(guess))
+
+    def decide(self, guess=False):
+        """
+        Choose tiles to play from exact mine probabilities.
+
+        Tiles which are certainly safe or certainly mines, given the whole board and the total
+        number of mines, are chosen. Failing that, if guess is set, the tile least likely to
+        be a mine is chosen to be revealed. Returns the sets of tiles to reveal and to flag.
+        """
+        weights, interior, interior_weight, total = mine_weights(self.game)
+        if not total:
+            return set(), set()
+
+        safe = {cell for cell, weight in weights.items() if not weight}
+        mines = {cell for cell, weight in weights.items() if weight == total}
+        if interior and not interior_weight:
+            safe.update(interior)
+        elif interior and interior_weight == total:
+            mines.update(interior)
+        if safe or mines or not guess:
+            return safe, mines
+
+        cell = min(weights, key=weights.get, default=None)
+        if interior and (cell is None or interior_weight < weights[cell]):
+            cell = interior[0]
+        self.guesses += 1
+        return {cell}, set()
+
+    def _apply(self, safe, mines):
+        """
+        Flag the given mines and reveal the given safe tiles, returning the tiles changed.
+        """
+        game = self.game
+
+        changed = []
+        for i in mines:
+            changed.extend(game.set_flag(i, True))
+        for i in safe:
+            changed.extend(game.reveal(i).tolist())
+        self.update(changed)
+        return changed
+
+    def solve(self, guess=False):
+        """
+        Play the game until it ends or nothing more can be deduced.
+
+        If guess is set, the game is instead played to the end, revealing the tile least
+        likely to be a mine whenever nothing can be deduced.
+        """
+        while not self.game.gameover:
+            if not (self.step() or self.resolve(guess)):
+                break
+        return
+
+    def moves(self, guess=False):
+        """
+        Play the game as solve, one round of moves at a time.
+
+        Yields the sets of tiles to reveal and to flag of each round before playing them, so
+        the same moves can be made on another copy of the game.
+        """
+        while not self.game.gameover:
+            safe, mines = self.deduce()
+            if not (safe or mines):
+                safe, mines = self.decide(guess)
+                if not (safe or mines):
+                    return
+            yield safe, mines
+            self._apply(safe, mines)
+        return
+
+
+class Hints:
+    """
+    Tiles of a game which can be proven safe or proven mines, kept up to date move by move.
+
+    The deductions are made by a Solver playing on a shadow copy of the game, in which every
+    tile proven to be a mine is flagged and every tile proven safe is revealed, so later
+    deductions can build on them. The shadow only knows the numbers the player has seen:
+    tiles revealed there but not in the game show no number. After each move only the
+    constraints touching the changed tiles are re-examined, so an update costs about as much
+    as the move itself.
+
+    Like the solver, hints assume the player's flags are correct. While the flags agree with
+    every number this makes no difference to which hints are found, but once a flag is seen
+    to contradict them every hint is deduced again after each move, as by a fresh Hints.
+
+    weights keeps the mine_weights of the game up to date for the hint probabilities.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.weights = MineWeights(game)
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Discard every hint and deduce them again from the whole board.
+        """
+        self._shadow = self.game.copy()
+        self._shadow.counts[~self.game.revealed] = 0
+        self._solver = Solver(self._shadow)
+        self.safe = set()
+        self.mines = set()
+        self._contradicted = False
+        self._deduce()
+        return
+
+    def update(self, changed):
+        """
+        Update the hints after the tiles in changed were revealed or marked.
+        """
+        self.weights.update(changed)
+        game, shadow = self.game, self._shadow
+        state, shadow_state = game.raw_state, shadow.raw_state
+        if self._contradicted:
+            # Deductions from contradicting flags depend on the order they are made in, so
+            # they are all made again as from a fresh start.
+            self.rebuild()
+            return
+        for i in changed:
+            if shadow_state[i] & FLAG and not state[i] & FLAG and (state[i] & REVEALED or i not in self.mines):
+                # A flag the player removed, or a wrong flag cleared by a reveal, may have
+                # been behind earlier deductions.
+                self.rebuild()
+                return
+            if state[i] & REVEALED:
+                shadow_state[i] = state[i]
+                shadow.raw_counts[i] = game.raw_counts[i]
+                self.safe.discard(i)
+            elif i in self.safe:
+                if state[i] & FLAG:
+                    # A flag on a tile proven safe contradicts the deductions.
+                    self.rebuild()
+                    return
+                # Question marks on a tile proven safe change nothing.
+                continue
+            elif i in self.mines:
+                shadow_state[i] = state[i] | FLAG
+            else:
+                shadow_state[i] = state[i]
+        self._solver.update(changed)
+        self._deduce()
+        if self._contradicted:
+            self.rebuild()
+        return
+
+    def _deduce(self):
+        """
+        Examine the queued constraints until nothing more can be deduced, playing the new
+        tiles found on the shadow.
+        """
+        shadow_state = self._shadow.raw_state
+        while True:
+            safe, mines = self._solver.deduce()
+            safe -= self.safe
+            safe = {i for i in safe if not shadow_state[i] & REVEALED}
+            mines -= self.mines
+            if self._solver.contradicted or safe & mines or any(shadow_state[i] & FLAG for i in safe):
+                self._contradicted = True
+            if not (safe or mines):
+                return
+            self.safe |= safe
+            self.mines |= mines
+            for i in safe:
+                shadow_state[i] |= REVEALED
+            for i in mines:
+                shadow_state[i] |= FLAG
+            self._solver.update(safe | mines)
+
+    def hidden_mines(self):
+        """
+        Return the tiles proven to be mines which the player has not flagged.
+        """
+        state = self.game.raw_state
+        return {i for i in self.mines if not state[i] & FLAG}
+
+
+def ai_playgame(game):
+    """
+    Automated solver.
+
+    Flags and reveals every tile of the given game which can be deduced from the tiles
+    already revealed.
+    """
+    Solver(game).solve()
+    return
@@ -0,0 +1,87 @@
+"""
+Sprite atlas for the Minesweeper UI.
+
+Every sprite is packed into the single image Sprites/atlas.png: the tiles side by side in
+one row, SPRITE_SIZE pixels square, with the logo below them. The atlas is decoded once, by
+Tk itself rather than PIL, and sliced into one image per sprite. The slices are cached for
+each tile size they are drawn at.
+
+Usage:
+    python sprites.py
+
+repacks the atlas from the separate sprite files, and needs PIL.
+
+Created by Daniel Fay
+"""
+
+
+import os
+
+SPRITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sprites")
+ATLAS_PATH = os.path.join(SPRITE_DIR, "atlas.png")
+
+# Width and height of a tile sprite in the atlas, in pixels.
+SPRITE_SIZE = 16
+
+# Names of the tile sprites, in the order they are packed, and of the logo.
+TILES = ['1', '2', '3', '4', '5', '6', '7', '8', 'blank', 'flag', 'mine', 'mine2', 'question', 'tile']
+LOGO = 'mine_image'
+LOGO_SIZE = 48
+
+# Sprites sliced from the atlas, by tile size, and the decoded atlas itself.
+_sprites = {}
+_atlas = None
+
+
+def layout():
+    """
+    Return the (left, top, right, bottom) box of each sprite in the atlas, by name.
+    """
+    boxes = {name: (k * SPRITE_SIZE, 0, (k + 1) * SPRITE_SIZE, SPRITE_SIZE) for k, name in enumerate(TILES)}
+    boxes[LOGO] = (0, SPRITE_SIZE, LOGO_SIZE, SPRITE_SIZE + LOGO_SIZE)
+    return boxes
+
+def load_sprites(master, tile_size=SPRITE_SIZE):
+    """
+    Return a dict of Tk images of every sprite, by name, scaled so that tiles are tile_size
+    pixels square.
+
+    tile_size must be a multiple of SPRITE_SIZE, as sprites are only scaled by whole
+    numbers to keep their pixels sharp.
+    """
+    from tkinter import PhotoImage
+    global _atlas
+
+    scale, rest = divmod(tile_size, SPRITE_SIZE)
+    if rest or not scale:
+        raise ValueError(f"tile size must be a multiple of {SPRITE_SIZE}, not {tile_size}")
+    if tile_size in _sprites:
+        return _sprites[tile_size]
+
+    if _atlas is None:
+        _atlas = PhotoImage(master=master, file=ATLAS_PATH)
+    sprites = {}
+    for name, (left, top, right, bottom) in layout().items():
+        image = PhotoImage(master=master, width=(right - left) * scale, height=(bottom - top) * scale)
+        image.tk.call(image, "copy", _atlas, "-from", left, top, right, bottom, "-zoom", scale)
+        sprites[name] = image
+    _sprites[tile_size] = sprites
+    return sprites
+
+def main():
+    from PIL import Image
+
+    boxes = layout()
+    width = max(right for left, top, right, bottom in boxes.values())
+    height = max(bottom for left, top, right, bottom in boxes.values())
+    atlas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    for name, (left, top, right, bottom) in boxes.items():
+        with Image.open(os.path.join(SPRITE_DIR, name + ".png")) as image:
+            atlas.paste(image.convert("RGBA"), (left, top))
+    atlas.save(ATLAS_PATH, optimize=True)
+    print(f"packed {len(boxes)} sprites into {ATLAS_PATH} ({os.path.getsize(ATLAS_PATH)} bytes)")
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Tests of the vectorized batch solver against a scalar fixpoint of the single tile rule.
+
+Created by Daniel Fay
+"""
+
+
+import numpy as np
+import pytest
+
+from batch import board_counts, deal, solve
+from engine import Game, mine_counts
+from solver import constraint
+
+# Board sizes tested, as (height, width, mines).
+SIZES = [(8, 8, 10), (16, 16, 40), (16, 30, 99), (9, 13, 30)]
+
+
+def single_rule_fixpoint(board, start):
+    """
+    Play a board from the tile start with only the single tile rule, one constraint at a
+    time, until nothing more can be done. Returns the game.
+    """
+    height, width = board.shape
+    game = Game(height, width, int(board.sum()), board=board)
+    game.reveal(start)
+    changed = True
+    while changed and not game.gameover:
+        changed = False
+        for i in np.flatnonzero(game.revealed & (game.counts > 0)).tolist():
+            cells, n = constraint(game, i)
+            if cells and n == 0:
+                for cell in cells:
+                    game.reveal(cell)
+                changed = True
+            elif cells and n == len(cells):
+                for cell in cells:
+                    game.set_flag(cell, True)
+                changed = True
+    return game
+
+@pytest.mark.parametrize("height, width, mines", SIZES)
+def test_deal(height, width, mines):
+    """
+    Every board dealt has its mines, none of them on or next to the safe tile, and the
+    counts of every board are those of mine_counts.
+    """
+    start = (height // 2) * width + width // 2
+    boards = deal(200, height, width, mines, np.random.default_rng(0), safe=start)
+    assert (boards.sum(axis=(1, 2)) == mines).all()
+    row, col = divmod(start, width)
+    assert not boards[:, max(row - 1, 0):row + 2, max(col - 1, 0):col + 2].any()
+    counts = board_counts(boards)
+    for board, count in zip(boards, counts):
+        assert (count == mine_counts(board)).all()
+    return
+
+@pytest.mark.parametrize("height, width, mines", SIZES)
+def test_solve_matches_scalar_fixpoint(height, width, mines):
+    """
+    Each board ends as the scalar fixpoint leaves it: won, or with the same tiles revealed
+    and flagged.
+    """
+    start = (height // 2) * width + width // 2
+    boards = deal(100, height, width, mines, np.random.default_rng(1), safe=start)
+    revealed, flagged, won, guesses, rounds = solve(boards, start)
+    assert not guesses.any()
+    for k, board in enumerate(boards):
+        game = single_rule_fixpoint(board, start)
+        assert won[k] == game.won
+        if not game.won:
+            assert (revealed[k] == game.revealed.reshape(board.shape)).all()
+            assert (flagged[k] == game.flagged.reshape(board.shape)).all()
+    return
+
+@pytest.mark.parametrize("height, width, mines", SIZES)
+def test_guessing_wins_every_board(height, width, mines):
+    """
+    With lucky guesses every board is won, guessing exactly on the boards the single tile
+    rule leaves unfinished.
+    """
+    start = (height // 2) * width + width // 2
+    boards = deal(100, height, width, mines, np.random.default_rng(2), safe=start)
+    plain = solve(boards, start)[2]
+    revealed, flagged, won, guesses, rounds = solve(boards, start, guess=True)
+    assert won.all()
+    assert ((guesses > 0) == ~plain).all()
+    return
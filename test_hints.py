@@ -0,0 +1,90 @@
+"""
+Regression tests for the incrementally updated hints and mine weights of solver.Hints.
+
+Created by Daniel Fay
+"""
+
+
+import random
+
+import pytest
+
+from engine import FLAG, MINE, REVEALED, Game
+from solver import Hints, mine_weights
+
+
+def assert_fresh(hints, game):
+    """
+    Check that the hints are those a fresh Hints of the game gives, and that the weights
+    kept are those of the whole board.
+    """
+    fresh = Hints(game)
+    assert hints.safe == fresh.safe
+    assert hints.hidden_mines() == fresh.hidden_mines()
+    assert hints.weights.get() == mine_weights(game)
+    return
+
+@pytest.mark.parametrize("seed", range(12))
+def test_hints_match_rebuild(seed):
+    """
+    Play randomly, mostly on hinted tiles but with wrong flags and unlucky clicks, and compare
+    the hints with a rebuild after every move.
+    """
+    rng = random.Random(seed)
+    game = Game(16, 30, 99, seed=seed)
+    hints = Hints(game)
+    size = game.height * game.width
+    while not game.gameover:
+        covered = [i for i in range(size) if not game.raw_state[i] & REVEALED]
+        if rng.random() < 0.5:
+            i = rng.choice(sorted(hints.safe) if hints.safe and rng.random() < 0.7 else covered)
+            if game.raw_state[i] & FLAG:
+                continue
+            changed = game.reveal(i).tolist()
+        else:
+            changed = game.cycle_mark(rng.choice(covered))
+        hints.update(changed)
+        if not game.gameover:
+            assert_fresh(hints, game)
+    return
+
+def unsound(hints, game):
+    """
+    Return whether any hint is wrong about a tile.
+    """
+    state = game.raw_state
+    return any(state[i] & MINE for i in hints.safe) or any(not state[i] & MINE for i in hints.mines)
+
+def wrong_flag_setup(seed):
+    """
+    Open a game and wrongly flag a tile which leads the hints astray and which a flood fill
+    from a covered empty tile would reveal.
+
+    Returns the game, its hints and the empty tile, or None if there is no such tile.
+    """
+    game = Game(16, 30, 99, seed=seed)
+    size = game.height * game.width
+    covered = lambda i: not game.raw_state[i] & (MINE | REVEALED)
+    game.reveal(next(i for i in range(size) if covered(i) and not game.raw_counts[i]))
+    for start in range(size):
+        if not covered(start) or game.raw_counts[start]:
+            continue
+        for tile in game.nbrs[start]:
+            if covered(tile):
+                hints = Hints(game)
+                hints.update(game.set_flag(tile, True))
+                if unsound(hints, game):
+                    return game, hints, start
+                game.set_flag(tile, False)
+    return None
+
+def test_wrong_flag_cleared_by_fill():
+    """
+    Deductions from a wrong flag are dropped once a flood fill reveals the tile and clears it.
+    """
+    game, hints, start = next(filter(None, map(wrong_flag_setup, range(100))))
+    hints.update(game.reveal(start).tolist())
+    assert not game.wrong_flags
+    assert not unsound(hints, game)
+    assert_fresh(hints, game)
+    return
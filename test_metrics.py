@@ -0,0 +1,95 @@
+"""
+Tests of the vectorized difficulty metrics against a breadth-first search of each board.
+
+Created by Daniel Fay
+"""
+
+
+from collections import deque
+
+import numpy as np
+import pytest
+
+from batch import deal, solve
+from engine import DIRECTIONS, Game, mine_counts
+from metrics import board_metrics, count_guesses, game_metrics
+from solver import Solver
+
+
+def count_regions(mask):
+    """
+    Count the regions of connected tiles, including diagonally, of a mask by breadth-first
+    search.
+    """
+    height, width = mask.shape
+    seen = np.zeros_like(mask)
+    regions = 0
+    for start in zip(*np.nonzero(mask)):
+        if seen[start]:
+            continue
+        regions += 1
+        seen[start] = True
+        queue = deque([start])
+        while queue:
+            row, col = queue.popleft()
+            for dr, dc in DIRECTIONS:
+                r, c = row + dr, col + dc
+                if 0 <= r < height and 0 <= c < width and mask[r, c] and not seen[r, c]:
+                    seen[r, c] = True
+                    queue.append((r, c))
+    return regions
+
+def reference_metrics(board):
+    """
+    Return the 3BV, openings and islands of one board, found tile by tile.
+    """
+    counts = mine_counts(board)
+    empty = ~board & (counts == 0)
+    height, width = board.shape
+    edge = np.zeros_like(empty)
+    for row in range(height):
+        for col in range(width):
+            edge[row, col] = empty[max(row - 1, 0):row + 2, max(col - 1, 0):col + 2].any()
+    isolated = ~board & ~edge
+    openings = count_regions(empty)
+    return openings + int(isolated.sum()), openings, count_regions(isolated)
+
+@pytest.mark.parametrize("height, width, mines",
+                         [(9, 9, 10), (16, 30, 99), (20, 30, 60), (5, 40, 3), (1, 1, 0)])
+def test_metrics_match_search(height, width, mines):
+    """
+    The metrics of every board of a batch are those found by searching it on its own.
+    """
+    boards = deal(100, height, width, mines, np.random.default_rng(height * width))
+    metrics = board_metrics(boards)
+    for k, board in enumerate(boards):
+        found = (metrics["bbbv"][k], metrics["openings"][k], metrics["islands"][k])
+        assert found == reference_metrics(board)
+    return
+
+def test_game_metrics():
+    """
+    game_metrics gives the metrics of a Game's board.
+    """
+    game = Game(16, 30, 99, seed=3)
+    bbbv, openings, islands = reference_metrics(game.is_mine.reshape(game.shape))
+    assert game_metrics(game) == {"bbbv": bbbv, "openings": openings, "islands": islands}
+    return
+
+def test_guesses():
+    """
+    A board needs guesses exactly when the Solver gets stuck on it without guessing, and
+    never when the single tile rule alone wins it.
+    """
+    height, width, mines = 16, 16, 40
+    start = (height // 2) * width + width // 2
+    boards = deal(40, height, width, mines, np.random.default_rng(4), safe=start)
+    guesses = count_guesses(boards, start)
+    assert guesses.any()
+    assert not guesses[solve(boards, start)[2]].any()
+    for k, board in enumerate(boards):
+        game = Game(height, width, mines, board=board)
+        game.reveal(start)
+        Solver(game).solve()
+        assert (guesses[k] > 0) == (not game.won)
+    return
@@ -0,0 +1,81 @@
+"""
+Round trip tests of the move log: games logged move by move replay to the same games.
+
+Created by Daniel Fay
+"""
+
+
+import numpy as np
+
+import movelog
+from engine import Game
+from savefile import encode
+
+
+def play_logged(log, seed, moves=40):
+    """
+    Start a game in the log and make random moves of every kind on it, logging each one.
+    Returns the game as it was left.
+    """
+    game = Game(16, 30, 99, seed=seed)
+    log.position(game, 0)
+    rng = np.random.default_rng(seed)
+    actions = [movelog.REVEAL, movelog.FLAG, movelog.QUESTION, movelog.CYCLE, movelog.MODE]
+    for t in range(moves):
+        if game.gameover:
+            break
+        action = actions[rng.integers(len(actions))]
+        arg, tile = int(rng.integers(2)), int(rng.integers(game.size))
+        if action == movelog.REVEAL and game.is_mine[tile] and rng.random() < 0.9:
+            continue
+        movelog.play(game, action, arg, tile)
+        log.record(t, action, arg, tile)
+    return game
+
+def test_replay_matches_logged_games(tmp_path):
+    """
+    Replaying a log with several games gives back each game as it was left.
+    """
+    path = tmp_path / "session.mlog"
+    log = movelog.MoveLog(path)
+    games = [play_logged(log, seed) for seed in range(5)]
+    log.close()
+
+    replayed = movelog.replay(movelog.read_log(path))
+    assert len(replayed) == len(games)
+    for game, again in zip(games, replayed):
+        assert bytes(again.raw_state) == bytes(game.raw_state)
+        assert (again.gameover, again.won) == (game.gameover, game.won)
+    return
+
+def test_log_cut_short(tmp_path):
+    """
+    A log cut off in the middle of a record is read up to its last whole record.
+    """
+    path = tmp_path / "crash.mlog"
+    log = movelog.MoveLog(path)
+    play_logged(log, 1)
+    log.close()
+    records = movelog.read_log(path)
+    with open(path, "r+b") as f:
+        f.truncate(path.stat().st_size - 3)
+    assert movelog.read_log(path) == records[:-1]
+    return
+
+def test_old_position_records(tmp_path):
+    """
+    A POSITION record of an older log jumps the game it is in to its position.
+    """
+    path = tmp_path / "old.mlog"
+    log = movelog.MoveLog(path)
+    play_logged(log, 2, moves=5)
+    jump = Game(16, 30, 99, seed=9)
+    jump.reveal(int(np.flatnonzero(~jump.is_mine)[0]))
+    data = encode(jump, 5)
+    log.record(5, movelog.POSITION, 0, len(data))
+    log._file.write(data)
+    log.close()
+
+    replayed, = movelog.replay(movelog.read_log(path))
+    assert bytes(replayed.raw_state) == bytes(jump.raw_state)
+    return
@@ -0,0 +1,87 @@
+"""
+Round trip tests of seeded boards and the binary save files.
+
+Created by Daniel Fay
+"""
+
+
+import numpy as np
+import pytest
+
+from engine import DIFFICULTIES, Game
+from savefile import decode, encode, load_game, save_game
+
+
+def played_game(seed, lose=False):
+    """
+    Return an expert game with some safe tiles revealed, some tiles flagged and question
+    marked, and a mine revealed if lose is set.
+    """
+    game = Game(*DIFFICULTIES["expert"], "expert", seed=seed)
+    rng = np.random.default_rng(seed)
+    safe = np.flatnonzero(~game.is_mine)
+    for i in rng.choice(safe, size=5, replace=False):
+        game.reveal(int(i))
+    marked = rng.choice(np.flatnonzero(~game.revealed), size=6, replace=False).tolist()
+    for i in marked[:3]:
+        game.set_flag(i, True)
+    for i in marked[3:]:
+        game.set_question(i, True)
+    if lose:
+        game.reveal(int(np.flatnonzero(game.is_mine & ~game.flagged)[0]))
+    return game
+
+def assert_same(loaded, game):
+    """
+    Check that a loaded game is the game which was saved.
+    """
+    assert (loaded.height, loaded.width, loaded.mines) == (game.height, game.width, game.mines)
+    assert (loaded.difficulty, loaded.seed) == (game.difficulty, game.seed)
+    assert bytes(loaded.raw_state) == bytes(game.raw_state)
+    assert (loaded.gameover, loaded.won, loaded.exploded) == (game.gameover, game.won, game.exploded)
+    assert loaded.remaining() == game.remaining()
+    return
+
+def test_seed_deals_same_board():
+    """
+    A seed deals the same board every time, and different seeds deal different boards.
+    """
+    first, again, other = (Game(16, 30, 99, seed=seed) for seed in (7, 7, 8))
+    assert (first.is_mine == again.is_mine).all()
+    assert (first.is_mine != other.is_mine).any()
+    return
+
+@pytest.mark.parametrize("lose", [False, True])
+def test_save_load_round_trip(tmp_path, lose):
+    """
+    A game saved to a file loads back as the same game, with the same time elapsed.
+    """
+    game = played_game(3, lose)
+    path = tmp_path / "game.mswp"
+    save_game(game, path, 42.5)
+    loaded, elapsed = load_game(path)
+    assert elapsed == 42.5
+    assert_same(loaded, game)
+    return
+
+def test_loaded_game_plays_on():
+    """
+    A game decoded from its save file plays on exactly as the original does.
+    """
+    game = played_game(5)
+    loaded, elapsed = decode(encode(game, 3))
+    for i in np.flatnonzero(~game.is_mine & ~game.revealed).tolist():
+        for g in (game, loaded):
+            g.set_flag(i, False)
+            g.reveal(i)
+    assert game.won
+    assert_same(loaded, game)
+    return
+
+def test_truncated_save_rejected():
+    """
+    A save file cut short is refused rather than loaded.
+    """
+    with pytest.raises(ValueError):
+        decode(encode(played_game(1))[:-1])
+    return
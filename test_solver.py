@@ -0,0 +1,82 @@
+"""
+Tests of the exact mine weights and probabilities of the solver against brute force
+enumeration of every arrangement of the mines.
+
+Created by Daniel Fay
+"""
+
+
+import itertools
+
+import numpy as np
+import pytest
+
+from engine import Game
+from solver import mine_probabilities, mine_weights
+
+
+def small_game(seed):
+    """
+    Return a game on a small board with a few tiles revealed and sometimes a correct flag,
+    or None if it ended while being set up.
+    """
+    rng = np.random.default_rng(seed)
+    height, width = int(rng.integers(3, 5)), int(rng.integers(3, 6))
+    game = Game(height, width, int(rng.integers(1, height * width // 3 + 1)), seed=seed)
+    safe = np.flatnonzero(~game.is_mine)
+    for i in rng.choice(safe, size=min(len(safe), int(rng.integers(1, 4))), replace=False):
+        game.reveal(int(i))
+    if rng.random() < 0.3:
+        game.set_flag(int(np.flatnonzero(game.is_mine & ~game.flagged)[0]), True)
+    return None if game.gameover else game
+
+def enumerate_mines(game):
+    """
+    Return the number of arrangements of the remaining mines among the covered, unflagged
+    tiles which agree with every revealed number, and how many of them have a mine on each
+    tile.
+    """
+    unknown = np.flatnonzero(~game.revealed & ~game.flagged).tolist()
+    revealed = np.flatnonzero(game.revealed).tolist()
+    total = 0
+    mines = np.zeros(game.size, dtype=np.int64)
+    for placed in itertools.combinations(unknown, game.mines - game.flags):
+        mask = game.flagged.copy()
+        mask[list(placed)] = True
+        if all(mask[list(game.nbrs[i])].sum() == game.counts[i] for i in revealed):
+            total += 1
+            mines += mask
+    return total, mines
+
+@pytest.mark.parametrize("seed", range(60))
+def test_weights_match_enumeration(seed):
+    """
+    Every count of mine_weights is the number of arrangements found by enumerating them.
+    """
+    game = small_game(seed)
+    if game is None:
+        pytest.skip("the game ended while being set up")
+    total, mines = enumerate_mines(game)
+    weights, interior, interior_weight, weights_total = mine_weights(game)
+    assert weights_total == total
+    for i, weight in weights.items():
+        assert weight == mines[i]
+    for i in interior:
+        assert interior_weight == mines[i]
+    return
+
+@pytest.mark.parametrize("seed", range(0, 60, 6))
+def test_probabilities_match_enumeration(seed):
+    """
+    mine_probabilities gives each covered tile its share of the arrangements with a mine
+    there, and nan for every other tile.
+    """
+    game = small_game(seed)
+    if game is None:
+        pytest.skip("the game ended while being set up")
+    total, mines = enumerate_mines(game)
+    probs = mine_probabilities(game)
+    known = game.revealed | game.flagged
+    assert np.isnan(probs[known]).all()
+    assert np.allclose(probs[~known], mines[~known] / total)
+    return